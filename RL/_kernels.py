@@ -0,0 +1,35 @@
+"""
+Numba kernels for the RL helpers. They live in their own module so that
+numba's import and JIT cost is only paid by the first caller that needs
+them; flow_manager and test_rl import this lazily and fall back to numpy
+when numba is not installed.
+"""
+
+import numpy as np
+from numba import njit, prange
+
+
+@njit(parallel=True, cache=True)
+def score_flows(path_offsets, path_indices, util, qlen, cap, bw):
+    """
+    Congestion impact of every flow. Flow i's links are
+    path_indices[path_offsets[i]:path_offsets[i + 1]] (CSR layout).
+    """
+    n = len(bw)
+    out = np.empty(n, dtype=np.float64)
+    for i in prange(n):
+        s = 0.0
+        for j in range(path_offsets[i], path_offsets[i + 1]):
+            l = path_indices[j]
+            s += (util[l] + qlen[l]) / cap[l]
+        out[i] = s * bw[i]
+    return out
+
+
+@njit(cache=True)
+def in_unit_range(a):
+    """Single pass over a, stopping at the first value outside [0, 1] or NaN"""
+    for x in a.flat:
+        if not (0.0 <= x <= 1.0):
+            return False
+    return True
@@ -3,9 +3,15 @@ Flow Manager for RL-based Traffic Engineering in CloudSimSDN.
 Handles critical flow selection and flow table updates.
 """
 
+import heapq
+import logging
 import numpy as np
-from typing import List, Dict, Tuple
+from collections.abc import Mapping
+from typing import List, Dict, Tuple, Optional, Iterator
 from dataclasses import dataclass
+from py4j.protocol import Py4JError
+
+logger = logging.getLogger(__name__)
 
 @dataclass
 class FlowStats:
@@ -27,44 +33,330 @@ class LinkStats:
     current_flows: List[str]
     queue_length: float
 
+def top_k_indices(scores: np.ndarray, k: int, ordered: bool = True) -> np.ndarray:
+    """
+    Indices of the k largest scores. Uses an O(n) partition instead of a
+    full sort; only the k survivors are sorted (descending) when ordered.
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(n)
+    if ordered:
+        idx = idx[np.argsort(-scores[idx], kind='stable')]
+    return idx
+
+def _score_flows_numpy(path_offsets, path_indices, util, qlen, cap, bw):
+    """Vectorized fallback for score_flows when numba is unavailable"""
+    out = np.zeros(len(bw), dtype=np.float64)
+    nonempty = np.diff(path_offsets) > 0
+    if nonempty.any():
+        per_link = ((util + qlen) / cap)[path_indices]
+        # reduceat would return a single element for empty segments, so only
+        # reduce over flows that actually have a path
+        out[nonempty] = np.add.reduceat(per_link, path_offsets[:-1][nonempty])
+    return out * bw
+
+# Resolved on the first score_flows call, so importing this module does not
+# import numba
+_score_flows_impl = None
+
+def score_flows(path_offsets, path_indices, util, qlen, cap, bw):
+    """
+    Congestion impact of every flow. Flow i's links are
+    path_indices[path_offsets[i]:path_offsets[i + 1]] (CSR layout).
+    Runs the numba kernel when numba is installed, else the numpy fallback.
+    """
+    global _score_flows_impl
+    if _score_flows_impl is None:
+        try:
+            from _kernels import score_flows as kernel
+        except ImportError:  # numba is optional; fall back to numpy
+            kernel = _score_flows_numpy
+        _score_flows_impl = kernel
+    return _score_flows_impl(path_offsets, path_indices, util, qlen, cap, bw)
+
+def _grow(arr: np.ndarray, fill: float) -> np.ndarray:
+    """Double an array's length, padding with fill"""
+    return np.concatenate([arr, np.full(len(arr), fill, dtype=arr.dtype)])
+
+class LinkTable(Mapping):
+    """
+    Columnar (struct-of-arrays) link statistics indexed by an interned int
+    slot. Links referenced by a flow path before they are reported get a
+    placeholder slot with infinite capacity (zero impact); only reported
+    links are visible through the mapping interface, which rebuilds
+    LinkStats objects on demand.
+    """
+
+    def __init__(self, capacity: int = 16):
+        self.id2idx: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.util = np.zeros(capacity, dtype=np.float32)
+        self.qlen = np.zeros(capacity, dtype=np.float32)
+        self.cap = np.full(capacity, np.inf, dtype=np.float32)
+        # None marks a placeholder slot that was never reported
+        self._current_flows: List[Optional[List[str]]] = []
+        self._n_reported = 0
+
+    @property
+    def size(self) -> int:
+        """Number of allocated slots, including placeholders"""
+        return len(self.ids)
+
+    def grow(self) -> None:
+        """Double the column capacity so appends stay amortized O(1)"""
+        self.util = _grow(self.util, 0.0)
+        self.qlen = _grow(self.qlen, 0.0)
+        self.cap = _grow(self.cap, np.inf)
+
+    def add(self, link_id: str) -> int:
+        """Return the slot for a link, appending a placeholder if needed"""
+        idx = self.id2idx.get(link_id)
+        if idx is not None:
+            return idx
+        idx = len(self.ids)
+        if idx == len(self.util):
+            self.grow()
+        self.id2idx[link_id] = idx
+        self.ids.append(link_id)
+        self._current_flows.append(None)
+        return idx
+
+    def update(self, link_id: str, stats: LinkStats) -> int:
+        """Overwrite a link's columns from stats and return its slot"""
+        idx = self.add(link_id)
+        self.util[idx] = stats.utilization
+        self.qlen[idx] = stats.queue_length
+        self.cap[idx] = stats.capacity
+        if self._current_flows[idx] is None:
+            self._n_reported += 1
+        self._current_flows[idx] = list(stats.current_flows)
+        return idx
+
+    def __getitem__(self, link_id: str) -> LinkStats:
+        idx = self.id2idx[link_id]
+        if self._current_flows[idx] is None:
+            raise KeyError(link_id)
+        return LinkStats(
+            link_id=link_id,
+            utilization=float(self.util[idx]),
+            capacity=float(self.cap[idx]),
+            current_flows=list(self._current_flows[idx]),
+            queue_length=float(self.qlen[idx])
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        return (lid for lid, flows in zip(self.ids, self._current_flows) if flows is not None)
+
+    def __len__(self) -> int:
+        return self._n_reported
+
+class FlowTable(Mapping):
+    """
+    Columnar (struct-of-arrays) flow statistics indexed by an interned int
+    slot. Paths are link slots in a CSR layout (path_offsets/path_indices),
+    rebuilt lazily after updates. The mapping interface rebuilds FlowStats
+    objects on demand.
+    """
+
+    def __init__(self, capacity: int = 16):
+        self.id2idx: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.bw = np.zeros(capacity, dtype=np.float64)
+        self.latency = np.zeros(capacity, dtype=np.float64)
+        self._paths: List[np.ndarray] = []
+        # Non-numeric fields, kept only to rebuild FlowStats
+        self._meta: List[Tuple[str, str, List[str], Dict[str, float]]] = []
+        self._csr: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def grow(self) -> None:
+        """Double the column capacity so appends stay amortized O(1)"""
+        self.bw = _grow(self.bw, 0.0)
+        self.latency = _grow(self.latency, 0.0)
+
+    def add(self, flow_id: str) -> int:
+        """Return the slot for a flow, appending an empty one if needed"""
+        idx = self.id2idx.get(flow_id)
+        if idx is not None:
+            return idx
+        idx = len(self.ids)
+        if idx == len(self.bw):
+            self.grow()
+        self.id2idx[flow_id] = idx
+        self.ids.append(flow_id)
+        self._paths.append(np.empty(0, dtype=np.intp))
+        self._meta.append(("", "", [], {}))
+        return idx
+
+    def update(self, flow_id: str, stats: FlowStats, path_idx: np.ndarray) -> int:
+        """Overwrite a flow's columns; path_idx holds its link slots"""
+        idx = self.add(flow_id)
+        self.bw[idx] = stats.bandwidth
+        self.latency[idx] = stats.latency
+        self._paths[idx] = path_idx
+        self._meta[idx] = (stats.src_id, stats.dst_id, list(stats.current_path), stats.queue_lengths)
+        self._csr = None
+        return idx
+
+    def path(self, idx: int) -> np.ndarray:
+        """Link slots on the path of the flow in slot idx"""
+        return self._paths[idx]
+
+    def _build_csr(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._csr is None:
+            offsets = np.zeros(len(self._paths) + 1, dtype=np.intp)
+            np.cumsum([len(p) for p in self._paths], out=offsets[1:])
+            indices = np.concatenate(self._paths) if self._paths else np.empty(0, dtype=np.intp)
+            self._csr = (offsets, indices)
+        return self._csr
+
+    @property
+    def path_offsets(self) -> np.ndarray:
+        return self._build_csr()[0]
+
+    @property
+    def path_indices(self) -> np.ndarray:
+        return self._build_csr()[1]
+
+    def __getitem__(self, flow_id: str) -> FlowStats:
+        idx = self.id2idx[flow_id]
+        src_id, dst_id, current_path, queue_lengths = self._meta[idx]
+        return FlowStats(
+            flow_id=flow_id,
+            src_id=src_id,
+            dst_id=dst_id,
+            bandwidth=float(self.bw[idx]),
+            current_path=list(current_path),
+            latency=float(self.latency[idx]),
+            queue_lengths=queue_lengths
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
 class RLFlowManager:
     """Manages flow statistics and updates for RL-based traffic engineering"""
     
     def __init__(self, max_reroute_ratio: float = 0.15):
         self.max_reroute_ratio = max_reroute_ratio
-        self.flow_stats: Dict[str, FlowStats] = {}
-        self.link_stats: Dict[str, LinkStats] = {}
+        # Columnar storage; indexing by id rebuilds FlowStats/LinkStats
+        self.flow_stats = FlowTable()
+        self.link_stats = LinkTable()
         self.last_update_time = 0.0
         self.update_interval = 1.0  # 1 second default
-        
+
+        # Per-link (utilization + queue_length) / capacity, cached between link updates
+        self._impact_per_link: Optional[np.ndarray] = None
+
+        # Running aggregates so get_flow_state never scans all flows/links.
+        # _util_heap is a max-heap of (-utilization, link_id, version); entries
+        # whose version is older than _link_version[link_id] are stale.
+        self._util_heap: List[Tuple[float, str, int]] = []
+        self._link_version: Dict[str, int] = {}
+        self._latency_sum = 0.0  # over finite latencies only
+        self._latency_count = 0
+        # Flows whose latency is NaN, +inf, -inf; kept out of _latency_sum so
+        # a later finite update fully replaces a non-finite one
+        self._latency_nonfinite = [0, 0, 0]
+
+    def _link_slot(self, link_id: str) -> int:
+        """Return the table slot for a link, allocating one if needed"""
+        n = self.link_stats.size
+        idx = self.link_stats.add(link_id)
+        if self.link_stats.size != n:
+            self._impact_per_link = None
+        return idx
+
     def update_flow_stats(self, flow_id: str, stats: FlowStats) -> None:
         """Update statistics for a single flow"""
-        self.flow_stats[flow_id] = stats
+        idx = self.flow_stats.id2idx.get(flow_id)
+        if idx is not None:
+            self._track_latency(self.flow_stats.latency[idx], -1)
+        else:
+            self._latency_count += 1
+        self._track_latency(stats.latency, 1)
+        path_idx = np.fromiter(
+            (self._link_slot(link_id) for link_id in stats.current_path),
+            dtype=np.intp,
+            count=len(stats.current_path)
+        )
+        self.flow_stats.update(flow_id, stats, path_idx)
         
+    def _track_latency(self, latency: float, sign: int) -> None:
+        """Add (sign=1) or remove (sign=-1) one flow latency from the running aggregates"""
+        if np.isfinite(latency):
+            self._latency_sum += sign * latency
+        elif np.isnan(latency):
+            self._latency_nonfinite[0] += sign
+        else:
+            self._latency_nonfinite[1 if latency > 0 else 2] += sign
+
+    def _avg_latency(self) -> float:
+        """Mean flow latency, with np.mean's NaN/inf semantics"""
+        n_nan, n_pos, n_neg = self._latency_nonfinite
+        if n_nan or (n_pos and n_neg):
+            return float('nan')
+        if n_pos or n_neg:
+            return float('inf') if n_pos else float('-inf')
+        return self._latency_sum / max(1, self._latency_count)
+
     def update_link_stats(self, link_id: str, stats: LinkStats) -> None:
         """Update statistics for a single link"""
-        self.link_stats[link_id] = stats
+        self.link_stats.update(link_id, stats)
+        self._impact_per_link = None
+
+        version = self._link_version.get(link_id, 0) + 1
+        self._link_version[link_id] = version
+        heapq.heappush(self._util_heap, (-stats.utilization, link_id, version))
+        if len(self._util_heap) > 2 * len(self._link_version) + 16:
+            # Drop stale entries so repeated updates don't grow the heap unbounded
+            self._util_heap = [e for e in self._util_heap if self._link_version[e[1]] == e[2]]
+            heapq.heapify(self._util_heap)
+
+    def _max_utilization(self) -> float:
+        """Current maximum link utilization, discarding stale heap entries"""
+        heap = self._util_heap
+        while heap and self._link_version[heap[0][1]] != heap[0][2]:
+            heapq.heappop(heap)
+        return -heap[0][0] if heap else 0.0
+
+    def _per_link_impact(self) -> np.ndarray:
+        """(utilization + queue_length) / capacity for every link slot, cached"""
+        if self._impact_per_link is None:
+            links = self.link_stats
+            n = links.size
+            self._impact_per_link = (links.util[:n] + links.qlen[:n]) / links.cap[:n]
+        return self._impact_per_link
+
+    def _score_all_flows(self) -> Tuple[List[str], np.ndarray]:
+        """Congestion impact of every known flow, computed in one kernel call"""
+        flows, links = self.flow_stats, self.link_stats
+        n, m = links.size, len(flows)
+        scores = score_flows(
+            flows.path_offsets, flows.path_indices,
+            links.util[:n], links.qlen[:n], links.cap[:n], flows.bw[:m]
+        )
+        return flows.ids, scores
         
     def calculate_congestion_impact(self, flow_id: str) -> float:
         """
         Calculate how much a flow contributes to network congestion.
-        Based on Zhang et al.'s approach.
+        Based on Zhang et al.'s approach: each link on the flow's path adds
+        (utilization + queue_length) / capacity, scaled by flow bandwidth.
         """
-        flow = self.flow_stats.get(flow_id)
-        if not flow:
+        idx = self.flow_stats.id2idx.get(flow_id)
+        if idx is None:
             return 0.0
-            
-        impact = 0.0
-        # Sum the utilization of links along flow's path
-        for link_id in flow.current_path:
-            link = self.link_stats.get(link_id)
-            if link:
-                # Higher impact if link is more utilized
-                impact += link.utilization / link.capacity
-                # Additional impact from queue buildup
-                impact += link.queue_length / link.capacity
-                
-        return impact * flow.bandwidth
+
+        path_idx = self.flow_stats.path(idx)
+        return float(self._per_link_impact()[path_idx].sum() * self.flow_stats.bw[idx])
         
     def select_critical_flows(self, current_time: float, k: int = 10) -> List[str]:
         """
@@ -75,24 +367,14 @@ class RLFlowManager:
         if current_time - self.last_update_time < self.update_interval:
             return []
             
-        # Calculate congestion impact for all flows
-        flow_impacts = {
-            flow_id: self.calculate_congestion_impact(flow_id)
-            for flow_id in self.flow_stats.keys()
-        }
-        
-        # Sort flows by impact
-        sorted_flows = sorted(
-            flow_impacts.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )
+        # Calculate congestion impact for all flows in one batch
+        flow_ids, impacts = self._score_all_flows()
         
         # Limit number of flows to reroute
         max_flows = int(len(self.flow_stats) * self.max_reroute_ratio)
         k = min(k, max_flows)
         
-        selected_flows = [flow_id for flow_id, _ in sorted_flows[:k]]
+        selected_flows = [flow_ids[i] for i in top_k_indices(impacts, k)]
         self.last_update_time = current_time
         
         return selected_flows
@@ -102,52 +384,109 @@ class RLFlowManager:
         return {
             'flows': self.flow_stats,
             'links': self.link_stats,
-            'max_utilization': max(
-                (link.utilization for link in self.link_stats.values()),
-                default=0.0
-            ),
-            'avg_latency': np.mean([
-                flow.latency for flow in self.flow_stats.values()
-            ])
+            'max_utilization': self._max_utilization(),
+            'avg_latency': self._avg_latency()
         }
 
+    @staticmethod
+    def invalidate_expected_latency_cache() -> None:
+        """Forget cached expected latencies, e.g. after flows were rerouted"""
+        invalidate_expected_latency_cache()
+
 
-def select_critical_flows_via_bridge(bridge, window: float = 5.0, k: int = 10, max_reroute_ratio: float = 0.15):
+# Expected (topology) latency per (src, dst) endpoint pair, shared across steps
+_EXP_CACHE: Dict[Tuple[int, int], float] = {}
+
+
+def invalidate_expected_latency_cache() -> None:
+    """Forget cached expected latencies, e.g. after flows were rerouted"""
+    _EXP_CACHE.clear()
+
+
+def as_array(values, dtype) -> np.ndarray:
+    """
+    Materialize bridge output as a numpy array. byte[] results (Python bytes)
+    are decoded in place; dtype must then match the wire format, e.g. '<f8'
+    for Java double or '<i4' for Java int.
+    """
+    if isinstance(values, (bytes, bytearray)):
+        return np.frombuffer(values, dtype=dtype)
+    return np.fromiter(values, dtype=dtype, count=len(values))
+
+
+def _expected_latencies(bridge, endpoints: np.ndarray, id_list: List[int]) -> np.ndarray:
+    """
+    Expected latency for each flow, looked up by (src, dst) in _EXP_CACHE.
+    Pairs not cached yet are resolved with a single batched bridge call.
+    """
+    pairs = list(zip(endpoints[:, 0].tolist(), endpoints[:, 1].tolist()))
+    missing: Dict[Tuple[int, int], int] = {}
+    for pair, fid in zip(pairs, id_list):
+        if pair[0] >= 0 and pair not in _EXP_CACHE and pair not in missing:
+            missing[pair] = fid
+
+    fresh: Dict[Tuple[int, int], float] = {}
+    if missing:
+        keys = list(missing)
+        values = as_array(bridge.getExpectedLatencies(
+            np.array([p[0] for p in keys], dtype='<i4').tobytes(),
+            np.array([p[1] for p in keys], dtype='<i4').tobytes(),
+            np.array(list(missing.values()), dtype='<i4').tobytes()), '<f8').tolist()
+        for pair, value in zip(keys, values):
+            fresh[pair] = value
+            if value > 0:
+                # Only cache successful lookups so failures are retried
+                _EXP_CACHE[pair] = value
+
+    return np.fromiter(
+        (_EXP_CACHE.get(pair, fresh.get(pair, -1.0)) for pair in pairs),
+        dtype=np.float64,
+        count=len(pairs)
+    )
+
+
+def select_critical_flows_via_bridge(bridge, window: float = 5.0, k: int = 10, max_reroute_ratio: float = 0.15,
+                                     ids: Optional[np.ndarray] = None):
     """
     Helper that queries the Java bridge for basic metrics and selects critical flows.
     Strategy: compute latency_ratio = (observed - expected) / expected and multiply by requested bandwidth.
-    Returns a list of flowIds to reroute.
+    Metrics for all flows are fetched with one batched bridge call each.
+    ids: int64 array of candidate flow ids, if the caller already fetched them.
+    Returns a list of flowIds (plain ints) to reroute.
     """
-    flow_ids = bridge.getFlowIds()
-    if flow_ids is None:
+    if ids is None:
+        flow_ids = bridge.getFlowIdsBytes()
+        if flow_ids is None:
+            return []
+        ids = as_array(flow_ids, '<i4').astype(np.int64)
+    if len(ids) == 0:
         return []
 
-    scores = []
-    for fid in flow_ids:
-        try:
-            obs = bridge.getFlowAvgLatency(int(fid), window)
-            endpoints = bridge.getFlowEndpoints(int(fid))
-            if endpoints is None:
-                continue
-            src = int(endpoints[0])
-            dst = int(endpoints[1])
-            exp = bridge.getExpectedLatency(src, dst, int(fid))
-            bw = bridge.getRequestedBandwidth(int(fid))
-            if obs <= 0 or exp <= 0:
-                ratio = 0.0
-            else:
-                ratio = (obs - exp) / exp
-            score = ratio * max(1.0, float(bw))
-            scores.append((fid, score))
-        except Exception:
-            continue
-
-    # sort and pick top-K while respecting max_reroute_ratio
-    scores.sort(key=lambda x: x[1], reverse=True)
+    # Ids go over the wire as int32 bytes, which Py4J passes as byte[]
+    # without needing auto_convert on the gateway
+    id_bytes = ids.astype('<i4').tobytes()
+    try:
+        obs = as_array(bridge.getFlowAvgLatencies(id_bytes, float(window)), '<f8')
+        endpoints = as_array(bridge.getFlowEndpointsBatch(id_bytes), '<i4').reshape(-1, 2)
+        exp = _expected_latencies(bridge, endpoints, ids.tolist())
+        bw = as_array(bridge.getRequestedBandwidths(id_bytes), '<f8')
+    except Py4JError as e:
+        logger.warning("Bridge metrics query failed, selecting no flows: %s", e)
+        return []
+
+    # Flows without known endpoints are not candidates
+    known = endpoints[:, 0] >= 0
+    valid = (obs > 0) & (exp > 0)
+    ratio = np.divide(obs - exp, exp, out=np.zeros_like(obs), where=valid)
+    scores = (ratio * np.maximum(1.0, bw))[known]
+    ids = ids[known]
+
+    # pick top-K while respecting max_reroute_ratio
     if len(scores) == 0:
         return []
 
     max_flows = max(1, int(len(scores) * max_reroute_ratio))
     k = min(k, max_flows)
-    selected = [int(fid) for fid, _ in scores[:k] if _ > 0]
-    return selected
\ No newline at end of file
+    top = top_k_indices(scores, k)
+    top = top[scores[top] > 0]
+    return ids[top].tolist()
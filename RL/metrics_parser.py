@@ -1,7 +1,32 @@
 import os
-import pandas as pd
 import numpy as np
 
+# (path, column name) -> ((mtime_ns, size), column array). Shared by every
+# reader in this module so an unchanged CSV is never parsed twice.
+_METRICS_CACHE = {}
+
+
+def _load_col(path, name, dtype=np.float32):
+    """
+    Loads a single numeric column from a CSV, selected by header name.
+    Falls back to the last column when the header does not contain it.
+    The result is cached until the file changes on disk; treat it as read-only.
+    """
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = (path, name)
+    cached = _METRICS_CACHE.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with open(path, "r") as f:
+        header = f.readline().strip().split(",")
+    col = header.index(name) if name in header else len(header) - 1
+    arr = np.loadtxt(path, delimiter=",", skiprows=1, usecols=[col], ndmin=1, dtype=dtype)
+    _METRICS_CACHE[key] = (stamp, arr)
+    return arr
+
+
 def extract_state(sim_path):
     """
     Reads CloudSimSDN output CSVs and produces a normalized state vector.
@@ -13,41 +38,62 @@ def extract_state(sim_path):
         print("[WARN] Missing metrics files, returning zeros.")
         return np.zeros(14)
 
-    link_df = pd.read_csv(link_file)
-    sw_df = pd.read_csv(sw_file)
-
-    # Extract average utilization per link
-    if "Utilization" in link_df.columns:
-        link_util = link_df["Utilization"].values
-    else:
-        link_util = link_df.iloc[:, -1].values  # fallback to last column
+    # Extract average utilization per link and energy consumption per switch
+    link_util = _load_col(link_file, "Utilization")
+    sw_energy = _load_col(sw_file, "Energy")
 
-    # Extract energy consumption per switch
-    if "Energy" in sw_df.columns:
-        sw_energy = sw_df["Energy"].values
-    else:
-        sw_energy = sw_df.iloc[:, -1].values
-
-    # Normalize
-    link_util = link_util / np.max(link_util) if np.max(link_util) > 0 else link_util
-    sw_energy = sw_energy / np.max(sw_energy) if np.max(sw_energy) > 0 else sw_energy
-
-    # Concatenate as state vector
+    # Concatenate as state vector, then normalize each part in place
+    # (the loaded columns are cached, so they must not be modified)
     state = np.concatenate([link_util, sw_energy])
+    for part in (state[:len(link_util)], state[len(link_util):]):
+        m = np.max(part)
+        np.divide(part, m, out=part, where=m > 0)
     return state[:14]  # limit for consistent state size
 
 
+# log path -> (offset scanned up to, failures counted before offset,
+# bytes just before offset). The marker detects a log rewritten in place.
+_LOG_SCAN = {}
+_LOG_MARKER_LEN = 64
+
+
 def count_packet_failures(sim_path):
     """
     Counts number of 'Packet failed' messages in the CloudSimSDN output log.
+    The log is scanned as raw bytes, without decoding lines.
+    Only bytes appended since the previous call are read; a truncated or
+    rewritten log is rescanned from the start.
     """
     log_file = os.path.join(sim_path, "result_fat-tree-workload-heuristic.csv")
-    count = 0
     if not os.path.exists(log_file):
         return 0
 
-    with open(log_file, "r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            if "Packet failed" in line:
-                count += 1
+    needle = b"Packet failed"
+    offset, count, marker = _LOG_SCAN.get(log_file, (0, 0, b""))
+    with open(log_file, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            _LOG_SCAN.pop(log_file, None)
+            return 0
+
+        # Read the new tail together with the bytes just before it, so the
+        # marker check and the scan share one read
+        start = offset - len(marker)
+        if size >= offset:
+            f.seek(start)
+            data = f.read(size - start)
+        if size < offset or data[:len(marker)] != marker:
+            offset, count, start = 0, 0, 0
+            f.seek(0)
+            data = f.read(size)
+
+    # Stop at the last complete line so a partially written line
+    # (and a needle split across writes) is picked up next time
+    end = data.rfind(b"\n", offset - start) + 1
+    if end > offset - start:
+        count += data.count(needle, offset - start, end)
+        offset = start + end
+        marker = data[max(0, end - _LOG_MARKER_LEN):end]
+
+    _LOG_SCAN[log_file] = (offset, count, marker)
     return count
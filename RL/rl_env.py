@@ -1,23 +1,81 @@
 import time
+import struct
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future
 import numpy as np
-from typing import List, Dict, Tuple, Optional
-from flow_manager import select_critical_flows_via_bridge
+from typing import List, Dict, Tuple, Optional, Sequence
+from py4j.protocol import Py4JError, Py4JJavaError
+from flow_manager import as_array, select_critical_flows_via_bridge, invalidate_expected_latency_cache
+
+logger = logging.getLogger(__name__)
 
 class NetworkState:
     """Represents the current state of the network including link utilization and flow metrics"""
-    def __init__(self, link_utils: Dict[str, float], flow_latencies: Dict[str, float]):
-        self.link_utils = link_utils
-        self.flow_latencies = flow_latencies
+    def __init__(self, link_utils, flow_latencies,
+                 link_order: Optional[Sequence] = None, flow_order: Optional[Sequence] = None):
+        """
+        link_utils/flow_latencies are dense arrays aligned with link_order/
+        flow_order when those are given (the CloudSimSDNEnv path). Without an
+        order they are legacy id -> value dicts, converted once using sorted
+        keys so the array ordering stays deterministic.
+        """
+        if link_order is None:
+            link_order = sorted(link_utils.keys())
+            link_utils = [link_utils[k] for k in link_order]
+        if flow_order is None:
+            flow_order = sorted(flow_latencies.keys())
+            flow_latencies = [flow_latencies[k] for k in flow_order]
+        self.link_order = link_order
+        self.flow_order = flow_order
+        self.link_arr = np.asarray(link_utils, dtype=np.float64)
+        self.flow_arr = np.asarray(flow_latencies, dtype=np.float64)
+
+    @property
+    def link_utils(self) -> Dict:
+        """Link utilizations keyed by link id (legacy accessor)"""
+        return dict(zip(self.link_order, self.link_arr.tolist()))
+
+    @property
+    def flow_latencies(self) -> Dict:
+        """Flow latencies keyed by flow id (legacy accessor)"""
+        return dict(zip(self.flow_order, self.flow_arr.tolist()))
+
+    def dict(self) -> Dict[str, Dict]:
+        """State as id -> value dicts, for legacy code paths"""
+        return {'link_utils': self.link_utils, 'flow_latencies': self.flow_latencies}
     
     def to_array(self) -> np.ndarray:
         """Convert state to a flat numpy array for RL agent consumption"""
-        # Concatenate link utilizations and flow latencies
-        # NOTE: Keep a deterministic ordering when converting to array.
-        # Caller (CloudSimSDNEnv) will typically create arrays in the
-        # desired order; this fallback uses sorted keys.
-        link_vals = np.array([self.link_utils[k] for k in sorted(self.link_utils.keys())])
-        flow_vals = np.array([self.flow_latencies[k] for k in sorted(self.flow_latencies.keys())])
-        return np.concatenate([link_vals, flow_vals])
+        return np.concatenate([self.link_arr, self.flow_arr])
+
+# Header of RLNetworkBridge.getStateBytes(): time, running, n_links, n_flows, util encoding
+_STATE_HEADER = struct.Struct('<diiii')
+
+# Util encoding 1: link utilizations as u2 fixed-point in [0, 1], padded to 8 bytes
+_UTIL_U16 = 1
+_U16_SCALE = np.float32(1.0 / 65535.0)
+
+
+def decode_state_bytes(payload: bytes) -> Tuple[float, bool, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decode a getStateBytes() payload into
+    (time, running, link_utils, flow_latencies, flow_ids). Latencies are
+    views of the payload; quantized utilizations are expanded to float32.
+    """
+    sim_time, running, n_links, n_flows, util_encoding = _STATE_HEADER.unpack_from(payload, 0)
+    offset = _STATE_HEADER.size
+    if util_encoding == _UTIL_U16:
+        raw = np.frombuffer(payload, dtype='<u2', count=n_links, offset=offset)
+        utils = raw.astype(np.float32) * _U16_SCALE
+        offset += (2 * n_links + 7) // 8 * 8
+    else:
+        utils = np.frombuffer(payload, dtype='<f8', count=n_links, offset=offset)
+        offset += 8 * n_links
+    lats = np.frombuffer(payload, dtype='<f8', count=n_flows, offset=offset)
+    offset += 8 * n_flows
+    flow_ids = np.frombuffer(payload, dtype='<i4', count=n_flows, offset=offset).astype(np.int64)
+    return sim_time, bool(running), utils, lats, flow_ids
+
 
 class CloudSimSDNEnv:
     """
@@ -26,11 +84,15 @@ class CloudSimSDNEnv:
     and reward calculation based on network performance metrics.
     """
 
-    def __init__(self, bridge, window: float = 5.0, k: int = 10, max_reroute_ratio: float = 0.15):
+    def __init__(self, bridge, window: float = 5.0, k: int = 10, max_reroute_ratio: float = 0.15,
+                 fp32_obs: bool = False):
         self.bridge = bridge
         self.window = window  # Time window for averaging metrics
+        self.fp32_obs = fp32_obs  # Full-precision link utilizations instead of 16-bit fixed point
         self.k = k  # Maximum flows to reroute per step
         self.max_reroute_ratio = max_reroute_ratio
+        self.reroute_timeout = 0.1  # Max seconds to wait for reroutes to be applied
+        self._await_supported = True
         
         # Cache network structure
         # bridge.getAllLinkIds() returns a list of string ids (labels). Build
@@ -45,50 +107,95 @@ class CloudSimSDNEnv:
         self.baseline_congestion = None
         
         # Get initial flow IDs to establish space dimensions
-        self.initial_flow_ids = sorted(str(x) for x in self.bridge.getFlowIds())
+        self.initial_flow_ids = sorted(str(x) for x in as_array(self.bridge.getFlowIdsBytes(), '<i4').tolist())
         self.n_flows = len(self.initial_flow_ids)
         
         # Define spaces
         self.observation_space_size = self.n_links + self.n_flows  # Link utils + flow latencies
         self.action_space_size = self.k  # Number of flows we can reroute
+
+        # Observation buffer reused across steps; _get_network_state fills the
+        # link/flow views in place instead of allocating new arrays.
+        self._obs = np.zeros(self.observation_space_size, dtype=np.float32)
+        self._link_view = self._obs[:self.n_links]
+        self._flow_view = self._obs[self.n_links:]
+        self._flow_pos = {int(f): i for i, f in enumerate(self.initial_flow_ids)}
+
+        # Simulation clock and running flag from the latest state snapshot
+        self.sim_time = 0.0
+        self.sim_running = True
+
+        # Background stepping for send()/recv(); created on first send()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Optional[Future] = None
         
-    def _normalize_value(self, value: float, is_utilization: bool = True) -> float:
-        """Normalize values to valid ranges and handle invalid values"""
-        if value is None or np.isnan(value) or np.isinf(value):
-            return 0.0
-        
-        if is_utilization:
-            # Utilization should be between 0 and 1
-            return max(0.0, min(1.0, float(value)))
-        else:
-            # Latency should be non-negative, cap at large value if needed
-            return max(0.0, min(1e6, float(value)))
+    @staticmethod
+    def _clean(arr: np.ndarray, hi: float) -> np.ndarray:
+        """Replace NaN/inf with 0 and clip values into [0, hi]"""
+        return np.clip(np.nan_to_num(arr, nan=0.0, posinf=0.0, neginf=0.0), 0.0, hi)
 
     def _get_network_state(self) -> NetworkState:
-        """Collect current network state from bridge"""
-        link_utils = {}
-        for link_id in self.link_ids:
-            try:
-                # Map label -> index and call Java bridge with the integer index
-                idx = self.link_id_to_idx[link_id]
-                util = self.bridge.getLinkAvgUtilization(int(idx), float(self.window))
-                link_utils[link_id] = self._normalize_value(util, is_utilization=True)
-            except Exception:
-                # On error, assume no utilization
-                link_utils[link_id] = 0.0
-            
-        flow_latencies = {}
-        for flow_id in self.bridge.getFlowIds():
-            try:
-                fid = int(flow_id)
-                latency = self.bridge.getFlowAvgLatency(int(fid), float(self.window))
-                flow_latencies[fid] = self._normalize_value(latency, is_utilization=False)
-            except Exception:
-                # On error, assume zero latency
-                flow_latencies[fid] = 0.0
+        """
+        Collect current network state from bridge in a single snapshot call.
+        Also refreshes the reusable observation buffer (self._obs) and the
+        simulation clock/running flag reported by step().
+        """
+        try:
+            sim_time, sim_running, raw_utils, raw_lats, flow_ids = decode_state_bytes(
+                self.bridge.getStateBytes(float(self.window), not self.fp32_obs))
+        except Exception:
+            # On error, assume no utilization and zero latency; the clock and
+            # running flag keep their last known values
+            self._obs[:] = 0.0
+            return NetworkState(np.zeros(self.n_links), np.zeros(len(self._flow_pos)),
+                                link_order=self.link_ids,
+                                flow_order=np.fromiter(self._flow_pos, dtype=np.int64,
+                                                       count=len(self._flow_pos)))
+        self.sim_time, self.sim_running = sim_time, sim_running
+
+        # Utilization should be between 0 and 1
+        utils = self._clean(raw_utils, 1.0)
+        self._link_view[:] = utils
+
+        # Latency should be non-negative, capped at a large value
+        lats = self._clean(raw_lats, 1e6)
+
+        # Flows outside the initial set have no slot in the observation
+        pos = np.fromiter((self._flow_pos.get(fid, -1) for fid in flow_ids.tolist()),
+                          dtype=np.intp, count=len(flow_ids))
+        known = pos >= 0
+        self._flow_view[:] = 0.0
+        self._flow_view[pos[known]] = lats[known]
             
-        return NetworkState(link_utils, flow_latencies)
+        return NetworkState(utils, lats, link_order=self.link_ids, flow_order=flow_ids)
     
+    def _await_reroutes(self) -> None:
+        """Wait until the NOS has applied issued reroutes (bounded by reroute_timeout)"""
+        if self._await_supported:
+            try:
+                self.bridge.awaitReroutesApplied(int(self.reroute_timeout * 1000))
+                return
+            except Exception as e:
+                if not self._barrier_missing(e):
+                    # Transient failure: wait this step out, retry the barrier next time
+                    logger.debug("awaitReroutesApplied failed: %s", e)
+                    time.sleep(self.reroute_timeout)
+                    return
+                # Older bridge without the barrier: fall back to a fixed delay
+                logger.warning("Bridge has no awaitReroutesApplied; waiting a fixed %.3fs after reroutes",
+                               self.reroute_timeout)
+                self._await_supported = False
+        time.sleep(self.reroute_timeout)
+
+    @staticmethod
+    def _barrier_missing(e: Exception) -> bool:
+        """True when e reports that awaitReroutesApplied does not exist on the bridge"""
+        if isinstance(e, AttributeError):
+            return True
+        # A missing method is reported as a plain Py4JError, not a Java exception
+        return (isinstance(e, Py4JError) and not isinstance(e, Py4JJavaError)
+                and "does not exist" in str(e))
+
     def _calculate_reward(self, prev_state: NetworkState, curr_state: NetworkState) -> float:
         """
         Calculate reward based on:
@@ -97,31 +204,25 @@ class CloudSimSDNEnv:
         3. Penalty for excessive rerouting
         """
         try:
-            # Get valid latency values (non-zero and finite)
-            prev_latencies = [v for v in prev_state.flow_latencies.values() 
-                            if v > 0 and np.isfinite(v)]
-            curr_latencies = [v for v in curr_state.flow_latencies.values() 
-                            if v > 0 and np.isfinite(v)]
+            # Valid latencies are non-zero and finite
+            pf, cf = prev_state.flow_arr, curr_state.flow_arr
+            mask_p = np.isfinite(pf) & (pf > 0)
+            mask_c = np.isfinite(cf) & (cf > 0)
             
             # Calculate latency improvement if we have valid values
-            if prev_latencies and curr_latencies:
-                prev_latency = np.mean(prev_latencies)
-                curr_latency = np.mean(curr_latencies)
-                latency_reward = prev_latency - curr_latency
+            if mask_p.any() and mask_c.any():
+                latency_reward = pf[mask_p].mean() - cf[mask_c].mean()
             else:
                 latency_reward = 0.0
             
-            # Get valid utilization values
-            prev_utils = [v for v in prev_state.link_utils.values() 
-                        if v >= 0 and np.isfinite(v)]
-            curr_utils = [v for v in curr_state.link_utils.values() 
-                        if v >= 0 and np.isfinite(v)]
+            # Valid utilizations are non-negative and finite
+            pl, cl = prev_state.link_arr, curr_state.link_arr
+            mask_p = np.isfinite(pl) & (pl >= 0)
+            mask_c = np.isfinite(cl) & (cl >= 0)
             
             # Calculate congestion reduction if we have valid values
-            if prev_utils and curr_utils:
-                prev_max_util = max(prev_utils)
-                curr_max_util = max(curr_utils)
-                congestion_reward = prev_max_util - curr_max_util
+            if mask_p.any() and mask_c.any():
+                congestion_reward = np.max(pl, where=mask_p, initial=0.0) - np.max(cl, where=mask_c, initial=0.0)
             else:
                 congestion_reward = 0.0
             
@@ -144,11 +245,19 @@ class CloudSimSDNEnv:
         4. Calculate reward based on resulting state
         
         Returns:
-            observation: Network state as numpy array
+            observation: Network state as numpy array (a reused buffer that is
+                overwritten by the next step/reset; copy it to keep history)
             reward: Float reward value
             done: Boolean indicating if episode is complete
             info: Additional step information
+
+        Raises RuntimeError while a send() is awaiting its recv().
         """
+        self._check_idle("step()")
+        return self._step()
+
+    def _step(self) -> Tuple[np.ndarray, float, bool, Dict]:
+        """step() body, also run on the background thread by send()"""
         # Get pre-action state
         prev_state = self._get_network_state()
         
@@ -157,19 +266,22 @@ class CloudSimSDNEnv:
             self.bridge, 
             window=self.window,
             k=self.k,
-            max_reroute_ratio=self.max_reroute_ratio
+            max_reroute_ratio=self.max_reroute_ratio,
+            ids=prev_state.flow_order
         )
         
         results = []
         for fid in selected:
             try:
-                ok = self.bridge.rerouteFlow(int(fid))
-                results.append({'flowId': int(fid), 'rerouted': bool(ok)})
+                ok = self.bridge.rerouteFlow(fid)
+                results.append({'flowId': fid, 'rerouted': bool(ok)})
             except Exception:
-                results.append({'flowId': int(fid), 'rerouted': False})
-        
-        # Small delay to let changes propagate
-        time.sleep(0.1)
+                results.append({'flowId': fid, 'rerouted': False})
+
+        # Rerouted flows take new paths, so cached expected latencies are stale
+        if any(r['rerouted'] for r in results):
+            invalidate_expected_latency_cache()
+            self._await_reroutes()
         
         # Get post-action state
         curr_state = self._get_network_state()
@@ -177,51 +289,67 @@ class CloudSimSDNEnv:
         # Calculate reward
         reward = self._calculate_reward(prev_state, curr_state)
 
-        # Convert state to observation array with fixed dimensionality
-        link_array = np.array([curr_state.link_utils[lid] for lid in self.link_ids])
-        
-        # Use initial flow IDs to maintain consistent observation space
-        flow_array = np.zeros(self.n_flows)
-        for i, fid in enumerate(self.initial_flow_ids):
-            if int(fid) in curr_state.flow_latencies:
-                flow_array[i] = curr_state.flow_latencies[int(fid)]
-        
-        obs = np.concatenate([link_array, flow_array])
+        # curr_state was collected last, so the observation buffer holds it
+        obs = self._obs
 
         # Check if simulation is complete
-        done = not bool(self.bridge.isRunning())
+        done = not self.sim_running
 
         info = {
-            'time': self.bridge.getTime(),
+            'time': self.sim_time,
             'selected_flows': results,
-            'avg_latency': np.mean(list(curr_state.flow_latencies.values())),
-            'max_utilization': max(curr_state.link_utils.values())
+            'avg_latency': float(np.mean(curr_state.flow_arr)),
+            'max_utilization': float(np.max(curr_state.link_arr))
         }
 
         return obs, reward, done, info
 
     def reset(self) -> np.ndarray:
-        """Reset environment and return initial observation"""
-        # Get initial state
-        state = self._get_network_state()
-        
-        # Convert to observation array using same format as step()
-        link_array = np.array([state.link_utils[lid] for lid in self.link_ids])
-        
-        flow_array = np.zeros(self.n_flows)
-        for i, fid in enumerate(self.initial_flow_ids):
-            if int(fid) in state.flow_latencies:
-                flow_array[i] = state.flow_latencies[int(fid)]
-        
-        return np.concatenate([link_array, flow_array])
-        """Reset environment state and return initial observation"""
+        """
+        Reset environment state and return initial observation.
+        Raises RuntimeError while a send() is awaiting its recv().
+        """
+        self._check_idle("reset()")
         # Clear metric history
         self.prev_avg_latency = None
         self.baseline_congestion = None
 
-        # Get initial state
-        initial_state = self._get_network_state()
-        link_array = np.array([initial_state.link_utils[lid] for lid in self.link_ids])
-        flow_keys_sorted = sorted(initial_state.flow_latencies.keys())
-        flow_array = np.array([initial_state.flow_latencies[fid] for fid in flow_keys_sorted])
-        return np.concatenate([link_array, flow_array])
+        # Get initial state; this fills the observation buffer
+        self._get_network_state()
+        return self._obs
+
+    def _check_idle(self, caller: str) -> None:
+        # The bridge's state snapshot buffer and self._obs assume a single
+        # consumer, so nothing else may touch them while a step is in flight
+        if self._pending is not None:
+            raise RuntimeError(f"{caller} called while a send() is awaiting recv()")
+
+    def send(self) -> None:
+        """
+        Start the next step() on a background thread and return immediately.
+        Collect its result with recv(); only one step may be in flight.
+        """
+        if self._pending is not None:
+            raise RuntimeError("recv() must be called before the next send()")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="env-step")
+        self._pending = self._executor.submit(self._step)
+
+    def recv(self) -> Tuple[np.ndarray, float, bool, Dict]:
+        """
+        Wait for the step started by send() and return its step() result.
+        The observation is copied, so it stays valid while a following
+        send() refills the observation buffer.
+        """
+        if self._pending is None:
+            raise RuntimeError("send() must be called before recv()")
+        pending, self._pending = self._pending, None
+        obs, reward, done, info = pending.result()
+        return obs.copy(), reward, done, info
+
+    def close(self) -> None:
+        """Wait for any in-flight step and stop the background thread"""
+        self._pending = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -1,31 +1,91 @@
 import json
 import random
 import os
+import bisect
+
+# Parsed virtual topologies keyed by absolute path. Each entry holds the
+# file's (mtime_ns, size) stamp, the parsed JSON and an index from
+# (source, destination) to the positions of matching links in data["links"].
+_TOPOLOGY_CACHE = {}
+
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load_topology(path):
+    """
+    Returns the cached [stamp, data, index] entry for a virtual topology,
+    re-parsing the file only when it changed on disk.
+    """
+    entry = _TOPOLOGY_CACHE.get(path)
+    stamp = _file_stamp(path)
+    if entry is not None and entry[0] == stamp:
+        return entry
+
+    with open(path, "r") as f:
+        data = json.load(f)
+    index = {}
+    for pos, link in enumerate(data["links"]):
+        index.setdefault((link["source"], link["destination"]), []).append(pos)
+    entry = [stamp, data, index]
+    _TOPOLOGY_CACHE[path] = entry
+    return entry
+
+
+def _set_destination(index, link, pos, new_dst):
+    """Points a link at new_dst, keeping the (source, destination) index in sync"""
+    old_key = (link["source"], link["destination"])
+    index[old_key].remove(pos)
+    if not index[old_key]:
+        del index[old_key]
+    link["destination"] = new_dst
+    bisect.insort(index.setdefault((link["source"], new_dst), []), pos)
+
 
 def reroute_link(virtual_file, src_vm, current_dst, all_vms):
     """
     Randomly reroute a link from src_vm to another destination.
-    Returns the name of the updated JSON file.
+    Returns the name of the updated JSON file, in the same (relative or
+    absolute) form as virtual_file.
+    The parsed topology stays cached between calls, so only the rewrite of
+    the output file touches disk.
     """
-    with open(virtual_file, "r") as f:
-        data = json.load(f)
+    source = os.path.abspath(virtual_file)
+    entry = _load_topology(source)
+    _, data, index = entry
 
     # Pick a new destination different from current_dst and src_vm
     candidates = [v for v in all_vms if v not in [current_dst, src_vm]]
     new_dst = random.choice(candidates)
 
-    # Find link to modify
-    for link in data["links"]:
-        if link["source"] == src_vm and link["destination"] == current_dst:
-            print(f"[ACTION] Rerouting {src_vm} → {current_dst} → {new_dst}")
-            link["destination"] = new_dst
-            link["name"] = f"{src_vm}-{new_dst}"
-            break
+    # Find link to modify (first match in document order)
+    link = None
+    positions = index.get((src_vm, current_dst))
+    if positions:
+        pos = positions[0]
+        link = data["links"][pos]
+        old_name = link.get("name")
+        print(f"[ACTION] Rerouting {src_vm} → {current_dst} → {new_dst}")
+        _set_destination(index, link, pos, new_dst)
+        link["name"] = f"{src_vm}-{new_dst}"
 
     # Save updated version
     output_file = os.path.join(os.path.dirname(virtual_file), "fat-tree-virtual-temp.json")
     updated_file = output_file
     with open(updated_file, "w") as f:
-        json.dump(data, f, indent=2)
+        json.dump(data, f)
+
+    if os.path.abspath(updated_file) == source:
+        # The cached data is now what is on disk
+        entry[0] = _file_stamp(updated_file)
+    elif link is not None:
+        # The source file is unchanged, so undo the edit in its cached copy
+        _set_destination(index, link, pos, current_dst)
+        if old_name is None:
+            del link["name"]
+        else:
+            link["name"] = old_name
 
     return updated_file, f"{src_vm}-{new_dst}"
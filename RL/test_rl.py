@@ -1,146 +1,242 @@
 #!/usr/bin/env python3
 
 import time
-import argparse
+import socket
 import logging
-from typing import List, Dict, Any
-from dataclasses import dataclass
-from py4j.java_gateway import JavaGateway, GatewayParameters
+import logging.handlers
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+from py4j.clientserver import ClientServer, JavaParameters, PythonParameters
 import numpy as np
 from rl_env import CloudSimSDNEnv
 
-# Set up logging
+# Set up logging. Records are buffered and written to stderr in batches of
+# up to 1024 (or immediately for errors); logging flushes them at exit.
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 logging.basicConfig(level=logging.INFO,
-                   format='%(asctime)s - %(levelname)s - %(message)s')
+                    handlers=[logging.handlers.MemoryHandler(1024, flushLevel=logging.ERROR,
+                                                             target=_stream_handler)])
 logger = logging.getLogger(__name__)
 
-@dataclass
 class EpisodeMetrics:
-    """Track metrics for a single episode"""
-    rewards: List[float]
-    max_utilizations: List[float]
-    avg_latencies: List[float]
-    step_times: List[float]
-    
+    """Track metrics for a single episode in arrays preallocated for n_steps"""
+
+    def __init__(self, n_steps: int):
+        self.rewards = np.empty(n_steps, dtype=np.float32)
+        self.max_utilizations = np.empty(n_steps, dtype=np.float32)
+        self.avg_latencies = np.empty(n_steps, dtype=np.float32)
+        self.step_times = np.empty(n_steps, dtype=np.float64)
+        self._n = 0  # Number of steps recorded so far
+
     def add_step(self, reward: float, info: Dict[str, Any]):
         """Add metrics from a single step"""
-        self.rewards.append(reward)
-        self.max_utilizations.append(info['max_utilization'])
-        self.avg_latencies.append(info['avg_latency'])
-        self.step_times.append(info['time'])
+        i = self._n
+        self.rewards[i] = reward
+        self.max_utilizations[i] = info['max_utilization']
+        self.avg_latencies[i] = info['avg_latency']
+        self.step_times[i] = info['time']
+        self._n = i + 1
     
     def print_summary(self):
         """Print episode statistics"""
+        n = self._n
         logger.info("Episode Summary:")
-        logger.info(f"Total steps: {len(self.rewards)}")
-        logger.info(f"Average reward: {np.mean(self.rewards):.4f}")
-        logger.info(f"Final max utilization: {self.max_utilizations[-1]:.4f}")
-        logger.info(f"Final avg latency: {self.avg_latencies[-1]:.4f}")
-        logger.info(f"Simulation time: {self.step_times[-1]:.2f}s")
+        logger.info("Total steps: %d", n)
+        if n == 0:
+            return
+        logger.info("Average reward: %.4f", np.mean(self.rewards[:n]))
+        logger.info("Final max utilization: %.4f", self.max_utilizations[n - 1])
+        logger.info("Final avg latency: %.4f", self.avg_latencies[n - 1])
+        logger.info("Simulation time: %.2fs", self.step_times[n - 1])
 
 
-def connect_gateway(port=25333, retries=20, delay=1.0):
-    """Try to connect to the Java gateway with retries."""
+def connect_gateway(port=25333, retries=20, delay=1.0, base_delay=0.001):
+    """
+    Try to connect to the Java gateway with retries.
+    Waits between attempts back off exponentially from base_delay up to delay seconds.
+    """
     last_exc = None
-    logger.info(f"Attempting to connect to Java gateway on port {port}")
+    logger.info("Attempting to connect to Java gateway on port %d", port)
     
     for attempt in range(retries):
         try:
-            gateway = JavaGateway(gateway_parameters=GatewayParameters(port=port))
-            # Test the connection by calling a simple method
-            gateway.jvm.System.currentTimeMillis()
+            # Cheap TCP probe: a gateway that is not up yet costs a refused
+            # connect, and once it accepts there is no need for a warm-up JVM call
+            socket.create_connection(("127.0.0.1", port), timeout=0.05).close()
+            # No callbacks are used, so the Python side listens on an ephemeral port
+            gateway = ClientServer(
+                java_parameters=JavaParameters(port=port),
+                python_parameters=PythonParameters(port=0, daemonize=True))
             logger.info("Successfully connected to Java gateway")
             return gateway
         except Exception as e:
             last_exc = e
             if attempt < retries - 1:  # Don't sleep on last attempt
-                logger.debug(f"Connection attempt {attempt + 1} failed, retrying in {delay}s...")
-                time.sleep(delay)
+                wait = min(delay, base_delay * 2 ** attempt)
+                logger.debug("Connection attempt %d failed, retrying in %ss...", attempt + 1, wait)
+                time.sleep(wait)
     
-    logger.error(f"Failed to connect to Java gateway after {retries} attempts")
-    logger.error(f"Last error: {last_exc}")
+    logger.error("Failed to connect to Java gateway after %d attempts", retries)
+    logger.error("Last error: %s", last_exc)
     raise last_exc
 
 
+def _in_unit_range_numpy(a: np.ndarray) -> bool:
+    # NaN fails both comparisons and inf fails the upper bound, so one
+    # fused predicate covers the NaN/finite/range checks
+    return bool(np.all((a >= 0.0) & (a <= 1.0)))
+
+# Below this many elements the fused numpy check is cheaper than importing
+# numba and JIT-compiling the kernel; the kernel is loaded on first need
+_KERNEL_MIN_SIZE = 1 << 16
+_in_unit_range_kernel = None
+
+def _in_unit_range(a: np.ndarray) -> bool:
+    global _in_unit_range_kernel
+    if a.size < _KERNEL_MIN_SIZE:
+        return _in_unit_range_numpy(a)
+    if _in_unit_range_kernel is None:
+        try:
+            from _kernels import in_unit_range as kernel
+        except ImportError:  # numba is optional; fall back to a fused numpy check
+            kernel = _in_unit_range_numpy
+        _in_unit_range_kernel = kernel
+    return bool(_in_unit_range_kernel(a))
+
+
 def validate_observation(obs: np.ndarray, expected_shape: tuple):
-    """Validate observation array"""
+    """
+    Validate observation array. The checks are asserts, so under python -O
+    the whole call is skipped, including the range scan that is not itself
+    inside an assert.
+    """
+    if __debug__:
+        _validate(obs, expected_shape)
+
+
+def _validate(obs: np.ndarray, expected_shape: tuple):
     assert obs is not None, "Observation cannot be None"
     assert isinstance(obs, np.ndarray), "Observation must be numpy array"
     assert obs.shape == expected_shape, f"Expected shape {expected_shape}, got {obs.shape}"
-    assert not np.any(np.isnan(obs)), "Observation contains NaN values"
-    assert np.all(np.isfinite(obs)), "Observation contains infinite values"
+    assert obs.dtype.kind == 'f', f"Observation must be floating point, got {obs.dtype}"
+    if _in_unit_range(obs):
+        return
+
+    # Something is out of range; rerun the individual checks for the message
+    assert np.all(np.isfinite(obs)), "Observation contains NaN or infinite values"
     assert np.all(obs >= 0), "Utilization/latency values must be non-negative"
     assert np.all(obs <= 1.0), "Utilization values must be <= 1.0"
 
-def test_rl_environment(no_shutdown: bool = False, n_steps: int = 20):
+def test_rl_environment(no_shutdown: bool = False, n_steps: int = 20, step_delay: float = 0.0,
+                        validate: bool = True, fp32_obs: bool = False):
     """Run a test episode of the RL environment with validation"""
     # Connect to the Java gateway
     gateway = connect_gateway()
     logger.info("Connected to Java gateway")
 
+    env = None
     try:
         # Get the bridge instance and create environment
         bridge = gateway.entry_point
-        env = CloudSimSDNEnv(bridge)
+        env = CloudSimSDNEnv(bridge, fp32_obs=fp32_obs)
         logger.info("Created RL environment")
 
         # Track episode metrics
-        metrics = EpisodeMetrics([], [], [], [])
+        metrics = EpisodeMetrics(n_steps)
+
+        # Loop-invariant validation inputs
+        expected_shape = (env.observation_space_size,)
+        required_keys = frozenset(('time', 'max_utilization', 'avg_latency'))
 
         # Reset environment (guarded)
         try:
             initial_state = env.reset()
-            logger.info(f"Initial state shape: {initial_state.shape}")
-            validate_observation(initial_state, (env.observation_space_size,))
+            logger.info("Initial state shape: %s", initial_state.shape)
+            if validate:
+                validate_observation(initial_state, expected_shape)
         except Exception as e:
-            logger.error(f"Error during reset: {e}")
+            logger.error("Error during reset: %s", e)
             return
 
-        # Run episode steps with validation
-        prev_time = 0.0
-        for i in range(n_steps):
-            logger.info(f"\nStep {i+1}:")
+        # Per-step checks and metric accumulation run on a single bookkeeping
+        # thread, in step order. The first failure stops later bookkeeping
+        # and ends the episode loop.
+        failed = threading.Event()
+
+        def bookkeep(step: int, obs: np.ndarray, reward: float, info: Dict[str, Any], prev_time: float):
+            if failed.is_set():
+                return
             try:
-                # Execute step
-                obs, reward, done, info = env.step()
-                
                 # Validate observation
-                validate_observation(obs, (env.observation_space_size,))
-                
+                if validate:
+                    validate_observation(obs, expected_shape)
+
                 # Validate info dict
-                assert all(k in info for k in ['time', 'max_utilization', 'avg_latency']), \
-                    "Missing required info fields"
-                
+                assert required_keys.issubset(info), "Missing required info fields"
+
                 # Validate simulation progress
-                curr_time = info['time']
-                assert curr_time > prev_time, "Simulation time must increase"
-                prev_time = curr_time
-                
+                assert info['time'] > prev_time, "Simulation time must increase"
+
                 # Track metrics
                 metrics.add_step(reward, info)
-                
-                # Log step info
-                logger.info(f"Observation shape: {obs.shape}")
-                logger.info(f"Reward: {reward:.4f}")
-                logger.info(f"Max utilization: {info['max_utilization']:.4f}")
-                logger.info(f"Avg latency: {info['avg_latency']:.4f}")
-                logger.info(f"Simulation time: {info['time']:.2f}s")
-                
+
+                # Log step info (one record per step, only with --debug)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("step=%d r=%.4f u=%.4f l=%.4f t=%.2f obs=%s", step, reward,
+                                 info['max_utilization'], info['avg_latency'], info['time'], obs.shape)
             except Exception as e:
-                logger.error(f"Error during step {i+1}: {e}")
-                break
+                failed.set()
+                logger.error("Error during step %d: %s", step, e)
 
-            if done:
-                logger.info("Episode finished")
-                break
+        # Run episode steps. Each step is started with env.send() before the
+        # previous one is handed to the bookkeeping thread, so the main thread
+        # only collects results and keeps the bridge busy. A failed check is
+        # seen before the next send(), so at most one step past the failing
+        # one runs (it was already in flight when the check ran).
+        prev_time = 0.0
+        finished = False
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="bookkeeping") as pool:
+            # Prime the first step; with no steps requested nothing is sent
+            if n_steps > 0:
+                env.send()
+            for i in range(n_steps):
+                try:
+                    # Collect the step started last iteration
+                    obs, reward, done, info = env.recv()
+
+                    # Stop without starting another step once a check failed
+                    if failed.is_set():
+                        break
+
+                    # Start the next step right away
+                    if not done and i + 1 < n_steps:
+                        # Optional delay between steps (off by default)
+                        if step_delay:
+                            time.sleep(step_delay)
+                        env.send()
+                except Exception as e:
+                    logger.error("Error during step %d: %s", i + 1, e)
+                    break
 
-            # Small delay between steps for stability
-            time.sleep(0.5)
+                pool.submit(bookkeep, i + 1, obs, reward, info, prev_time)
+                prev_time = info.get('time', prev_time)
+
+                if done:
+                    finished = True
+                    break
+
+        # Logged after the pool drained so it follows the last step's record
+        if finished and not failed.is_set():
+            logger.info("Episode finished")
         
         # Print episode summary
         metrics.print_summary()
 
     finally:
+        if env is not None:
+            env.close()
         if not no_shutdown:
             try:
                 gateway.shutdown()
@@ -150,17 +246,27 @@ def test_rl_environment(no_shutdown: bool = False, n_steps: int = 20):
 
 
 if __name__ == "__main__":
+    # Only needed when run as a script, so importers do not pay for it
+    import argparse
+
     parser = argparse.ArgumentParser()
     parser.add_argument("--no-shutdown", dest="no_shutdown", action="store_true",
                         help="Do not call gateway.shutdown() at the end (leave Java gateway running)")
     parser.add_argument("--steps", type=int, default=20,
                         help="Number of steps to run in test episode")
+    parser.add_argument("--step-delay", dest="step_delay", type=float, default=0.0,
+                        help="Seconds to sleep between steps (default: 0)")
+    parser.add_argument("--skip-validate", dest="skip_validate", action="store_true",
+                        help="Skip per-step observation validation")
+    parser.add_argument("--fp32-obs", dest="fp32_obs", action="store_true",
+                        help="Transfer link utilizations at full precision instead of 16-bit fixed point")
     parser.add_argument("--debug", action="store_true",
-                        help="Enable debug logging")
+                        help="Enable debug logging (per-step details)")
     
     args = parser.parse_args()
     
     if args.debug:
         logger.setLevel(logging.DEBUG)
     
-    test_rl_environment(no_shutdown=args.no_shutdown, n_steps=args.steps)
\ No newline at end of file
+    test_rl_environment(no_shutdown=args.no_shutdown, n_steps=args.steps, step_delay=args.step_delay,
+                        validate=not args.skip_validate, fp32_obs=args.fp32_obs)
\ No newline at end of file
@@ -1,9 +1,12 @@
 import os
 import time
 import sys
+import struct
+
+import numpy as np
 
 try:
-    from py4j.java_gateway import JavaGateway, GatewayParameters
+    from py4j.clientserver import ClientServer, JavaParameters, PythonParameters
 except Exception as e:
     print("py4j is required to run this test. Install with: pip install py4j")
     raise
@@ -13,15 +16,25 @@ PORT = int(os.environ.get('PY4J_PORT', '25333'))
 if __name__ == '__main__':
     print(f"Attempting to connect to Py4J gateway on port {PORT}...")
     try:
-        gw = JavaGateway(gateway_parameters=GatewayParameters(port=PORT))
+        gw = ClientServer(java_parameters=JavaParameters(port=PORT),
+                          python_parameters=PythonParameters(port=0, daemonize=True))
         bridge = gw.entry_point
 
         print('Connected. Querying bridge...')
-        flow_ids = bridge.getFlowIds()
-        link_ids = bridge.getAllLinkIds()
-        now = bridge.getTime()
-
-        print('flow_ids ->', flow_ids)
+        # Time, flow ids and link ids arrive in one round-trip; see
+        # RLNetworkBridge.getBridgeSnapshot() for the layout
+        buf = memoryview(bridge.getBridgeSnapshot())
+        now, n_flows = struct.unpack_from('<di', buf, 0)
+        offset = 12
+        # Indexing this array is a local numpy op, unlike a JavaList proxy
+        flow_ids = np.frombuffer(buf, dtype='<i4', count=n_flows, offset=offset)
+        offset += 4 * n_flows
+        n_links, label_bytes = struct.unpack_from('<ii', buf, offset)
+        offset += 8
+        labels = bytes(buf[offset:offset + label_bytes]).decode('utf-8')
+        link_ids = labels.split('\n') if n_links else []
+
+        print('flow_ids ->', flow_ids.tolist())
         print('link_ids ->', link_ids)
         print('sim time ->', now)
 
@@ -35,7 +48,10 @@ if __name__ == '__main__':
             print(f'flow {fid} avg latency (5s):', lat)
 
         print('Bridge smoke test passed')
-        gw.close()
+        # Close only the Python side; shutdown() would also stop the Java
+        # server and leave the simulation unreachable for later runs
+        gw.shutdown_callback_server()
+        gw.close(keep_callback_server=True)
     except Exception as e:
         print('Failed to connect or query the bridge:', e)
         print('Make sure the Java example is running and that PY4J_PORT is set correctly (default 25333).')
@@ -0,0 +1,187 @@
+import numpy as np
+import pytest
+from py4j.protocol import Py4JError
+
+from flow_manager import (FlowStats, LinkStats, RLFlowManager, invalidate_expected_latency_cache,
+                          select_critical_flows_via_bridge)
+
+
+def _flow(flow_id, path, bandwidth=1.0, latency=0.0):
+    return FlowStats(flow_id=flow_id, src_id="s", dst_id="d", bandwidth=bandwidth,
+                     current_path=list(path), latency=latency, queue_lengths={})
+
+
+def _link(link_id, utilization, capacity, queue_length=0.0):
+    return LinkStats(link_id=link_id, utilization=utilization, capacity=capacity,
+                     current_flows=[], queue_length=queue_length)
+
+
+@pytest.fixture
+def manager():
+    fm = RLFlowManager(max_reroute_ratio=1.0)
+    # Per-link impact: L1 = (0.5 + 1) / 10 = 0.15, L2 = 0.2 / 4 = 0.05
+    fm.update_link_stats("L1", _link("L1", 0.5, 10.0, queue_length=1.0))
+    fm.update_link_stats("L2", _link("L2", 0.2, 4.0))
+    fm.update_flow_stats("f1", _flow("f1", ["L1", "L2"], bandwidth=2.0, latency=0.3))
+    # "Lx" is never reported, so it contributes nothing
+    fm.update_flow_stats("f2", _flow("f2", ["L2", "Lx"], bandwidth=1.0, latency=0.1))
+    fm.update_flow_stats("f3", _flow("f3", [], bandwidth=3.0, latency=0.2))
+    return fm
+
+
+def test_congestion_impact(manager):
+    assert manager.calculate_congestion_impact("f1") == pytest.approx(0.4)
+    assert manager.calculate_congestion_impact("f2") == pytest.approx(0.05)
+    assert manager.calculate_congestion_impact("f3") == 0.0
+    assert manager.calculate_congestion_impact("unknown") == 0.0
+
+
+def test_unknown_link_is_a_hidden_placeholder(manager):
+    assert len(manager.link_stats) == 2
+    assert set(manager.link_stats) == {"L1", "L2"}
+    assert "Lx" not in manager.link_stats
+    assert manager.link_stats.size == 3
+
+    # Reporting the link later makes it count towards f2
+    manager.update_link_stats("Lx", _link("Lx", 1.0, 2.0))
+    assert len(manager.link_stats) == 3
+    assert manager.calculate_congestion_impact("f2") == pytest.approx(0.55)
+
+
+def test_path_update_replaces_old_path(manager):
+    manager.update_flow_stats("f1", _flow("f1", ["L2"], bandwidth=2.0, latency=0.3))
+    assert manager.calculate_congestion_impact("f1") == pytest.approx(0.1)
+    assert manager.flow_stats["f1"].current_path == ["L2"]
+    assert len(manager.flow_stats) == 3
+    assert manager.select_critical_flows(current_time=5.0, k=3) == ["f1", "f2", "f3"]
+
+
+def test_select_critical_flows(manager):
+    assert manager.select_critical_flows(current_time=5.0, k=2) == ["f1", "f2"]
+    # Inside the update interval nothing is selected
+    assert manager.select_critical_flows(current_time=5.5, k=2) == []
+
+    manager.max_reroute_ratio = 0.4  # int(3 * 0.4) = 1
+    assert manager.select_critical_flows(current_time=10.0, k=2) == ["f1"]
+
+
+def test_flow_state(manager):
+    state = manager.get_flow_state()
+    assert state["max_utilization"] == pytest.approx(0.5)
+    assert state["avg_latency"] == pytest.approx(0.2)
+    assert state["links"]["L1"].capacity == pytest.approx(10.0)
+
+    # Re-updates replace, not add to, the running aggregates
+    manager.update_link_stats("L1", _link("L1", 0.1, 10.0))
+    manager.update_flow_stats("f1", _flow("f1", ["L1"], bandwidth=2.0, latency=0.6))
+    state = manager.get_flow_state()
+    assert state["max_utilization"] == pytest.approx(0.2)
+    assert state["avg_latency"] == pytest.approx(0.3)
+
+
+def test_empty_manager():
+    fm = RLFlowManager(max_reroute_ratio=1.0)
+    assert fm.select_critical_flows(current_time=5.0) == []
+    state = fm.get_flow_state()
+    assert state["max_utilization"] == 0.0
+    assert state["avg_latency"] == 0.0
+
+
+def test_tables_grow_past_initial_capacity():
+    rng = np.random.default_rng(0)
+    fm = RLFlowManager(max_reroute_ratio=1.0)
+    n_links, n_flows = 40, 50
+    util = rng.random(n_links)
+    cap = rng.random(n_links) * 10 + 1
+    qlen = rng.random(n_links)
+
+    # Flows first, so paths allocate placeholder slots that the link
+    # reports fill in later (and that grow() has to carry across)
+    paths, bws = [], []
+    for f in range(n_flows):
+        path = [f"L{j}" for j in rng.choice(n_links, size=rng.integers(0, 5), replace=False)]
+        paths.append(path)
+        bws.append(float(rng.random() * 5))
+        fm.update_flow_stats(f"f{f}", _flow(f"f{f}", path, bandwidth=bws[-1], latency=float(f)))
+    for j in range(n_links):
+        fm.update_link_stats(f"L{j}", _link(f"L{j}", util[j], cap[j], queue_length=qlen[j]))
+
+    assert len(fm.flow_stats) == n_flows
+    assert len(fm.link_stats) == n_links
+    expected = {}
+    for f, (path, bw) in enumerate(zip(paths, bws)):
+        expected[f"f{f}"] = sum((util[int(l[1:])] + qlen[int(l[1:])]) / cap[int(l[1:])] for l in path) * bw
+        assert fm.calculate_congestion_impact(f"f{f}") == pytest.approx(expected[f"f{f}"], rel=1e-5)
+
+    top = sorted(expected, key=expected.get, reverse=True)[:10]
+    assert fm.select_critical_flows(current_time=5.0, k=10) == top
+    state = fm.get_flow_state()
+    assert state["max_utilization"] == pytest.approx(util.max(), rel=1e-6)
+    assert state["avg_latency"] == pytest.approx((n_flows - 1) / 2)
+
+
+class _BytesBridge:
+    """Bridge whose batched methods, like the Java side, only accept int32 bytes"""
+
+    def __init__(self, ids, observed, expected, bandwidth):
+        self.ids, self.observed, self.expected, self.bandwidth = ids, observed, expected, bandwidth
+
+    @staticmethod
+    def _ints(payload):
+        assert isinstance(payload, bytes)
+        return np.frombuffer(payload, dtype='<i4').tolist()
+
+    def getFlowIdsBytes(self):
+        return np.array(self.ids, dtype='<i4').tobytes()
+
+    def getFlowAvgLatencies(self, flow_ids, window):
+        return np.array([self.observed[f] for f in self._ints(flow_ids)], dtype='<f8').tobytes()
+
+    def getFlowEndpointsBatch(self, flow_ids):
+        return np.array([[f, f + 100] for f in self._ints(flow_ids)], dtype='<i4').tobytes()
+
+    def getExpectedLatencies(self, srcs, dsts, flow_ids):
+        self._ints(srcs), self._ints(dsts)
+        return np.array([self.expected[f] for f in self._ints(flow_ids)], dtype='<f8').tobytes()
+
+    def getRequestedBandwidths(self, flow_ids):
+        return np.array([self.bandwidth[f] for f in self._ints(flow_ids)], dtype='<f8').tobytes()
+
+
+def test_select_critical_flows_via_bridge_sends_bytes():
+    invalidate_expected_latency_cache()
+    # Scores: ratio (observed - expected) / expected times max(1, bandwidth)
+    # 1 -> 1.0 * 1, 2 -> 3.0 * 2, 3 -> -0.5 (never selected)
+    bridge = _BytesBridge(ids=[1, 2, 3],
+                          observed={1: 2.0, 2: 4.0, 3: 0.5},
+                          expected={1: 1.0, 2: 1.0, 3: 1.0},
+                          bandwidth={1: 0.5, 2: 2.0, 3: 1.0})
+    assert select_critical_flows_via_bridge(bridge, k=3, max_reroute_ratio=1.0) == [2, 1]
+    invalidate_expected_latency_cache()
+
+
+def test_select_critical_flows_via_bridge_bridge_error():
+    class Failing(_BytesBridge):
+        def getFlowAvgLatencies(self, flow_ids, window):
+            raise Py4JError("bridge down")
+
+    bridge = Failing(ids=[1], observed={}, expected={}, bandwidth={})
+    assert select_critical_flows_via_bridge(bridge) == []
+
+
+@pytest.mark.parametrize("bad", [float("inf"), float("-inf"), float("nan")])
+def test_non_finite_latency_is_undone_by_later_update(manager, bad):
+    manager.update_flow_stats("f1", _flow("f1", ["L1"], latency=bad))
+    avg = manager.get_flow_state()["avg_latency"]
+    np.testing.assert_equal(avg, np.mean([bad, 0.1, 0.2]))
+
+    manager.update_flow_stats("f1", _flow("f1", ["L1"], latency=0.6))
+    assert manager.get_flow_state()["avg_latency"] == pytest.approx(0.3)
+
+
+def test_mixed_infinities_average_to_nan(manager):
+    manager.update_flow_stats("f1", _flow("f1", ["L1"], latency=float("inf")))
+    manager.update_flow_stats("f2", _flow("f2", ["L1"], latency=float("-inf")))
+    assert np.isnan(manager.get_flow_state()["avg_latency"])
+    manager.update_flow_stats("f2", _flow("f2", ["L1"], latency=0.1))
+    assert manager.get_flow_state()["avg_latency"] == float("inf")
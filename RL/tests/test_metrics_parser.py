@@ -0,0 +1,62 @@
+import pytest
+
+import metrics_parser
+from metrics_parser import count_packet_failures
+
+LOG_NAME = "result_fat-tree-workload-heuristic.csv"
+
+
+@pytest.fixture
+def log(tmp_path):
+    metrics_parser._LOG_SCAN.clear()
+    path = tmp_path / LOG_NAME
+
+    def write(data, mode="ab"):
+        with open(path, mode) as f:
+            f.write(data)
+
+    yield write
+    metrics_parser._LOG_SCAN.clear()
+
+
+def test_missing_and_empty_log(tmp_path, log):
+    assert count_packet_failures(str(tmp_path)) == 0
+    log(b"", "wb")
+    assert count_packet_failures(str(tmp_path)) == 0
+
+
+def test_appended_lines_are_counted_once(tmp_path, log):
+    log(b"0.1,Packet failed\n0.2,ok\n")
+    assert count_packet_failures(str(tmp_path)) == 1
+    assert count_packet_failures(str(tmp_path)) == 1
+    log(b"0.3,Packet failed\n0.4,Packet failed Packet failed\n")
+    assert count_packet_failures(str(tmp_path)) == 4
+
+
+def test_partial_last_line_waits_for_newline(tmp_path, log):
+    log(b"0.1,Packet failed\n0.2,Packet failed")
+    assert count_packet_failures(str(tmp_path)) == 1
+    log(b"\n")
+    assert count_packet_failures(str(tmp_path)) == 2
+
+
+def test_needle_split_across_writes(tmp_path, log):
+    log(b"0.1,ok\n0.2,Packet fa")
+    assert count_packet_failures(str(tmp_path)) == 0
+    log(b"iled\n")
+    assert count_packet_failures(str(tmp_path)) == 1
+
+
+def test_rewritten_or_shrunk_log_is_rescanned(tmp_path, log):
+    log(b"0.1,Packet failed\n" * 5)
+    assert count_packet_failures(str(tmp_path)) == 5
+
+    # Shrunk below the scanned offset
+    log(b"0.1,Packet failed\n", "wb")
+    assert count_packet_failures(str(tmp_path)) == 1
+
+    # Rewritten in place with different content past the old offset
+    log(b"0.1,something else\n0.2,Packet failed\n", "wb")
+    assert count_packet_failures(str(tmp_path)) == 1
+    log(b"x" * 100 + b"\n0.1,Packet failed\n", "wb")
+    assert count_packet_failures(str(tmp_path)) == 1
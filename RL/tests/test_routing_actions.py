@@ -0,0 +1,82 @@
+import json
+import os
+
+import pytest
+
+import routing_actions
+from routing_actions import reroute_link
+
+VMS = ["vm0", "vm1", "vm2", "vm3"]
+
+
+@pytest.fixture
+def topology(tmp_path):
+    routing_actions._TOPOLOGY_CACHE.clear()
+    data = {"nodes": [{"name": v} for v in VMS], "links": [
+        {"name": "vm0-vm1", "source": "vm0", "destination": "vm1"},
+        {"name": "vm1-vm2", "source": "vm1", "destination": "vm2"},
+        {"name": "vm0-vm1-b", "source": "vm0", "destination": "vm1"},
+    ]}
+    path = tmp_path / "fat-tree-virtual.json"
+    path.write_text(json.dumps(data))
+    yield str(path)
+    routing_actions._TOPOLOGY_CACHE.clear()
+
+
+def _cached(path):
+    return routing_actions._TOPOLOGY_CACHE[os.path.abspath(path)]
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _check_index(entry):
+    """The (source, destination) index matches the cached links"""
+    _, data, index = entry
+    expected = {}
+    for pos, link in enumerate(data["links"]):
+        expected.setdefault((link["source"], link["destination"]), []).append(pos)
+    assert index == expected
+
+
+def test_separate_output_leaves_cached_source_untouched(topology):
+    original = _load(topology)
+    out, name = reroute_link(topology, "vm0", "vm1", VMS)
+
+    assert out == os.path.join(os.path.dirname(topology), "fat-tree-virtual-temp.json")
+    written = _load(out)
+    assert written["links"][0]["destination"] not in ("vm0", "vm1")
+    assert written["links"][0]["name"] == name
+    # Only the first matching link is rerouted
+    assert written["links"][2] == original["links"][2]
+
+    assert _load(topology) == original
+    assert _cached(topology)[1] == original
+    _check_index(_cached(topology))
+
+
+def test_chained_calls_stay_in_sync_with_disk(topology):
+    out, _ = reroute_link(topology, "vm0", "vm1", VMS)
+    for _ in range(5):
+        link = _load(out)["links"][1]
+        out2, name = reroute_link(out, link["source"], link["destination"], VMS)
+        assert out2 == out
+        assert _load(out)["links"][1]["name"] == name
+        assert _cached(out)[1] == _load(out)
+        _check_index(_cached(out))
+
+
+def test_missing_link_leaves_data_unchanged(topology):
+    original = _load(topology)
+    out, _ = reroute_link(topology, "vm3", "vm0", VMS)
+    assert _load(out) == original
+    assert _cached(topology)[1] == original
+    _check_index(_cached(topology))
+
+
+def test_relative_path_is_returned_relative(topology, monkeypatch):
+    monkeypatch.chdir(os.path.dirname(topology))
+    out, _ = reroute_link("fat-tree-virtual.json", "vm0", "vm1", VMS)
+    assert out == "fat-tree-virtual-temp.json"
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from flow_manager import _score_flows_numpy, score_flows
+
+
+def _reference(path_offsets, path_indices, util, qlen, cap, bw):
+    out = []
+    for i in range(len(bw)):
+        links = path_indices[path_offsets[i]:path_offsets[i + 1]]
+        out.append(sum((util[l] + qlen[l]) / cap[l] for l in links) * bw[i])
+    return np.array(out, dtype=np.float64)
+
+
+def _case(path_lengths, n_links=6, seed=0):
+    rng = np.random.default_rng(seed)
+    offsets = np.zeros(len(path_lengths) + 1, dtype=np.intp)
+    np.cumsum(path_lengths, out=offsets[1:])
+    indices = rng.integers(0, n_links, size=offsets[-1]).astype(np.intp)
+    util = rng.random(n_links).astype(np.float32)
+    qlen = rng.random(n_links).astype(np.float32)
+    cap = (rng.random(n_links) * 10 + 1).astype(np.float32)
+    cap[0] = np.inf  # placeholder link, contributes nothing
+    bw = rng.random(len(path_lengths)) * 5
+    return offsets, indices, util, qlen, cap, bw
+
+
+@pytest.mark.parametrize("path_lengths", [
+    [],                      # no flows
+    [0, 0, 0],               # only empty paths
+    [3, 0, 2, 0],            # empty paths between non-empty ones
+    [0, 4],                  # leading empty path
+    [2, 1, 5, 3, 0, 1, 4],
+])
+def test_kernel_and_fallback_agree(path_lengths):
+    args = _case(path_lengths)
+    expected = _reference(*args)
+    fallback = _score_flows_numpy(*args)
+    kernel = score_flows(*args)
+    assert fallback.shape == kernel.shape == (len(path_lengths),)
+    np.testing.assert_allclose(fallback, expected, rtol=1e-6)
+    np.testing.assert_allclose(kernel, expected, rtol=1e-6)
@@ -0,0 +1,128 @@
+import struct
+
+import numpy as np
+import pytest
+from py4j.protocol import Py4JError, Py4JNetworkError
+
+from rl_env import CloudSimSDNEnv, decode_state_bytes
+
+
+def _payload(utils, lats, ids, quantize=False, sim_time=12.5, running=True):
+    """Pack a payload the way RLNetworkBridge.getStateBytes() does"""
+    header = struct.pack('<diiii', sim_time, int(running), len(utils), len(ids), int(quantize))
+    if quantize:
+        body = np.round(np.clip(utils, 0.0, 1.0) * 65535).astype('<u2').tobytes()
+        body += b'\0' * (-len(body) % 8)
+    else:
+        body = np.asarray(utils, dtype='<f8').tobytes()
+    return (header + body + np.asarray(lats, dtype='<f8').tobytes()
+            + np.asarray(ids, dtype='<i4').tobytes())
+
+
+def test_decode_f8_round_trip():
+    payload = _payload([0.25, 0.5, 1.0], [0.01, 2.5], [7, 3])
+    assert len(payload) == 24 + 8 * 3 + 12 * 2
+    sim_time, running, utils, lats, ids = decode_state_bytes(payload)
+    assert sim_time == 12.5
+    assert running is True
+    np.testing.assert_array_equal(utils, [0.25, 0.5, 1.0])
+    np.testing.assert_array_equal(lats, [0.01, 2.5])
+    np.testing.assert_array_equal(ids, [7, 3])
+    assert ids.dtype == np.int64
+
+
+def test_decode_u16_round_trip():
+    # Three u2 values are padded to 8 bytes
+    payload = _payload([0.0, 0.3, 1.0], [4.0], [11], quantize=True, running=False)
+    assert len(payload) == 24 + 8 + 12
+    sim_time, running, utils, lats, ids = decode_state_bytes(payload)
+    assert running is False
+    np.testing.assert_allclose(utils, [0.0, 0.3, 1.0], atol=1.0 / 65535)
+    np.testing.assert_array_equal(lats, [4.0])
+    np.testing.assert_array_equal(ids, [11])
+
+
+def test_decode_empty():
+    sim_time, running, utils, lats, ids = decode_state_bytes(_payload([], [], []))
+    assert utils.size == 0 and lats.size == 0 and ids.size == 0
+
+
+class _Bridge:
+    def __init__(self):
+        self.fail = False
+
+    def getAllLinkIds(self):
+        return ['0', '1']
+
+    def getFlowIdsBytes(self):
+        return np.array([5, 6], dtype='<i4').tobytes()
+
+    def getStateBytes(self, window, quantize):
+        if self.fail:
+            raise RuntimeError("bridge down")
+        return _payload([0.5, 0.75], [0.2, 0.4], [5, 6], quantize=quantize)
+
+
+def test_state_falls_back_to_zeros_on_bridge_error():
+    bridge = _Bridge()
+    env = CloudSimSDNEnv(bridge, fp32_obs=True)
+    np.testing.assert_allclose(env.reset(), [0.5, 0.75, 0.2, 0.4])
+    assert env.sim_time == 12.5
+
+    bridge.fail = True
+    obs = env.reset()
+    np.testing.assert_array_equal(obs, np.zeros(4))
+    # Clock and running flag keep their last known values
+    assert env.sim_time == 12.5
+    assert env.sim_running is True
+
+
+def test_reset_and_step_refuse_while_send_is_pending():
+    env = CloudSimSDNEnv(_Bridge(), fp32_obs=True)
+    env.send()
+    try:
+        with pytest.raises(RuntimeError):
+            env.reset()
+        with pytest.raises(RuntimeError):
+            env.step()
+    finally:
+        env.close()
+    env.reset()
+
+
+class _Barrier:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def awaitReroutesApplied(self, timeout_ms):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+
+
+def _await_env(bridge):
+    env = CloudSimSDNEnv.__new__(CloudSimSDNEnv)
+    env.bridge = bridge
+    env.reroute_timeout = 0.0
+    env._await_supported = True
+    return env
+
+
+def test_await_reroutes_retries_after_transient_error():
+    bridge = _Barrier(Py4JNetworkError("connection reset"))
+    env = _await_env(bridge)
+    env._await_reroutes()
+    env._await_reroutes()
+    assert env._await_supported
+    assert bridge.calls == 2
+
+
+def test_await_reroutes_falls_back_when_method_is_missing():
+    bridge = _Barrier(Py4JError("An error occurred while calling o0.awaitReroutesApplied. Trace:\n"
+                                "py4j.Py4JException: Method awaitReroutesApplied([]) does not exist"))
+    env = _await_env(bridge)
+    env._await_reroutes()
+    env._await_reroutes()
+    assert not env._await_supported
+    assert bridge.calls == 1
@@ -23,7 +23,7 @@ import org.cloudbus.cloudsim.sdn.policies.selectlink.LinkSelectionPolicy;
 import org.cloudbus.cloudsim.sdn.policies.selectlink.LinkSelectionPolicyBandwidthAllocation;
 import org.cloudbus.cloudsim.sdn.policies.vmallocation.VmAllocationPolicyCombinedLeastFullFirst;
 
-import py4j.GatewayServer;
+import py4j.ClientServer;
 
 /**
  * Lightweight example runner that builds a small datacenter from a physical
@@ -37,7 +37,7 @@ public class RLMonitoringExample {
 
     private NetworkOperatingSystem nos;
     private RLNetworkBridge bridge;
-    private GatewayServer server;
+    private ClientServer server;
     private SDNDatacenter datacenter;
     private boolean isRunning;
 
@@ -127,9 +127,13 @@ public class RLMonitoringExample {
 
     private void startBridge() {
         bridge = new RLNetworkBridge(nos);
-        server = new GatewayServer(bridge);
-        server.start();
-        System.out.println("Py4J gateway started on port: " + server.getListeningPort());
+        // Pinned-thread model: each Python thread is served by one dedicated JVM
+        // thread, so the RL loop's bridge calls do not hop between JVM threads
+        server = new ClientServer.ClientServerBuilder(bridge)
+                .autoStartJavaServer(false)
+                .build();
+        server.startServer();
+        System.out.println("Py4J gateway started on port: " + server.getJavaServer().getListeningPort());
     }
 
     private void startSimulation() {
@@ -102,6 +102,12 @@ public abstract class NetworkOperatingSystem extends SimEntity {
 	private double lastAdjustAllChannelTime = -1;
 	private double nextEventTime = -1;
 	
+	// Reroutes requested through the RL bridge vs. reroutes whose channels have been re-adjusted.
+	// Guarded by rerouteLock; the bridge thread waits on it in awaitReroutesApplied().
+	private final Object rerouteLock = new Object();
+	private long reroutesRequested = 0;
+	private long reroutesApplied = 0;
+	
 	/**
 	 * 1. map VMs and middleboxes to hosts, add the new vm/mb to the vmHostTable, advise host, advise dc
 	 * 2. set channels and bws
@@ -162,7 +168,17 @@ public abstract class NetworkOperatingSystem extends SimEntity {
 		
 		switch(tag){
 			case CloudSimTagsSDN.SDN_INTERNAL_CHANNEL_PROCESS:
+				long requested;
+				synchronized(rerouteLock) {
+					requested = reroutesRequested;
+				}
 				processInternalAdjustChannels();
+				synchronized(rerouteLock) {
+					if(requested > reroutesApplied) {
+						reroutesApplied = requested;
+					}
+					rerouteLock.notifyAll();
+				}
 				break;				
 			case CloudSimTagsSDN.SDN_INTERNAL_PACKET_PROCESS: 
 				processInternalPacketProcessing(); 
@@ -819,6 +835,25 @@ public abstract class NetworkOperatingSystem extends SimEntity {
 		return Math.max(up, down);
 	}
 
+	/**
+	 * Return average utilization (max of up/down) of every link over a given window (seconds),
+	 * in the same order as getAllLinkIds().
+	 */
+	public double[] getLinkAvgUtilizations(double windowSeconds) {
+		Collection<Link> links = this.topology.getAllLinks();
+		double end = CloudSim.clock();
+		double start = end - windowSeconds;
+		if(start < 0) start = 0;
+		double[] res = new double[links.size()];
+		int i = 0;
+		for(Link l: links) {
+			double up = l.getMonitoringValuesLinkUtilizationUp().getAverageValue(start, end);
+			double down = l.getMonitoringValuesLinkUtilizationDown().getAverageValue(start, end);
+			res[i++] = Math.max(up, down);
+		}
+		return res;
+	}
+
 	/**
 	 * Return node address path for a given flowId (as int array). If not found, returns null.
 	 */
@@ -845,11 +880,38 @@ public abstract class NetworkOperatingSystem extends SimEntity {
 		SDNHost sender = findHost(flow.getSrcId());
 		boolean ok = vnMapper.updateDynamicForwardingTableRec(sender, flow.getSrcId(), flow.getDstId(), flowId, true);
 		if(ok) {
+			synchronized(rerouteLock) {
+				reroutesRequested++;
+			}
 			sendAdjustAllChannelEvent();
 		}
 		return ok;
 	}
 
+	/**
+	 * Block until every reroute requested so far has been applied to the channels,
+	 * or until the timeout (milliseconds) expires. Returns true if all were applied.
+	 */
+	public boolean awaitReroutesApplied(long timeoutMs) {
+		long deadline = System.currentTimeMillis() + timeoutMs;
+		synchronized(rerouteLock) {
+			long target = reroutesRequested;
+			while(reroutesApplied < target) {
+				long remaining = deadline - System.currentTimeMillis();
+				if(remaining <= 0 || !CloudSim.running()) {
+					return false;
+				}
+				try {
+					rerouteLock.wait(remaining);
+				} catch (InterruptedException e) {
+					Thread.currentThread().interrupt();
+					return false;
+				}
+			}
+			return true;
+		}
+	}
+
 	/**
 	 * Return endpoints for a flow: [srcId, dstId]
 	 */
@@ -2,6 +2,9 @@ package org.cloudbus.cloudsim.sdn.nos;
 
 import org.cloudbus.cloudsim.core.CloudSim;
 
+import java.nio.ByteBuffer;
+import java.nio.ByteOrder;
+import java.nio.charset.StandardCharsets;
 import java.util.ArrayList;
 import java.util.List;
 
@@ -11,6 +14,8 @@ import java.util.List;
  */
 public class RLNetworkBridge {
     private final NetworkOperatingSystem nos;
+    // Reused by getStateBytes(); only reallocated when the link/flow counts change
+    private ByteBuffer stateBuf = ByteBuffer.allocate(0);
 
     public RLNetworkBridge(NetworkOperatingSystem nos) {
         this.nos = nos;
@@ -20,6 +25,18 @@ public class RLNetworkBridge {
         return nos.getFlowIds();
     }
 
+    /**
+     * getFlowIds() as little-endian int32 bytes, transferred by Py4J in one read.
+     */
+    public byte[] getFlowIdsBytes() {
+        List<Integer> flowIds = nos.getFlowIds();
+        ByteBuffer buf = ByteBuffer.allocate(4 * flowIds.size()).order(ByteOrder.LITTLE_ENDIAN);
+        for (Integer flowId : flowIds) {
+            buf.putInt(flowId);
+        }
+        return buf.array();
+    }
+
     public double getFlowAvgLatency(int flowId, double windowSeconds) {
         return nos.getFlowAvgLatency(flowId, windowSeconds);
     }
@@ -32,6 +49,13 @@ public class RLNetworkBridge {
         return nos.getLinkAvgUtilization(linkIndex, windowSeconds);
     }
 
+    /**
+     * Batched variant of getLinkAvgUtilization for all links, ordered as getAllLinkIds().
+     */
+    public double[] getLinkAvgUtilizations(double windowSeconds) {
+        return nos.getLinkAvgUtilizations(windowSeconds);
+    }
+
     public int[] getFlowPath(int flowId) {
         return nos.getFlowPath(flowId);
     }
@@ -44,6 +68,14 @@ public class RLNetworkBridge {
         return nos.rerouteFlow(flowId);
     }
 
+    /**
+     * Block until all reroutes issued so far are applied, or timeoutMs elapses.
+     * Returns true if the reroutes were applied within the timeout.
+     */
+    public boolean awaitReroutesApplied(long timeoutMs) {
+        return nos.awaitReroutesApplied(timeoutMs);
+    }
+
     public double getExpectedLatency(int srcVm, int dstVm, int flowId) {
         return nos.calculateLatency(srcVm, dstVm, flowId);
     }
@@ -52,10 +84,182 @@ public class RLNetworkBridge {
         return nos.getRequestedBandwidth(flowId);
     }
 
+    /**
+     * Batched variant of getFlowAvgLatency: one Py4J round-trip for all given flows.
+     * Flow ids are passed as little-endian int32 bytes; the result is little-endian
+     * float64 bytes.
+     */
+    public byte[] getFlowAvgLatencies(byte[] flowIdBytes, double windowSeconds) {
+        int[] flowIds = toInts(flowIdBytes);
+        double[] res = new double[flowIds.length];
+        for (int i = 0; i < res.length; i++) {
+            res[i] = nos.getFlowAvgLatency(flowIds[i], windowSeconds);
+        }
+        return toBytes(res);
+    }
+
+    /**
+     * Batched variant of getFlowEndpoints, flattened as [src0, dst0, src1, dst1, ...].
+     * Unknown flows are reported as -1, -1. Flow ids are passed and the result is
+     * returned as little-endian int32 bytes.
+     */
+    public byte[] getFlowEndpointsBatch(byte[] flowIdBytes) {
+        int[] flowIds = toInts(flowIdBytes);
+        int[] res = new int[flowIds.length * 2];
+        for (int i = 0; i < flowIds.length; i++) {
+            int[] endpoints = nos.getFlowEndpoints(flowIds[i]);
+            res[2 * i] = endpoints == null ? -1 : endpoints[0];
+            res[2 * i + 1] = endpoints == null ? -1 : endpoints[1];
+        }
+        return toBytes(res);
+    }
+
+    /**
+     * Batched variant of getExpectedLatency. Entries that cannot be computed are -1.
+     * VM and flow ids are passed as little-endian int32 bytes; the result is
+     * little-endian float64 bytes.
+     */
+    public byte[] getExpectedLatencies(byte[] srcVmBytes, byte[] dstVmBytes, byte[] flowIdBytes) {
+        int[] srcVms = toInts(srcVmBytes);
+        int[] dstVms = toInts(dstVmBytes);
+        int[] flowIds = toInts(flowIdBytes);
+        double[] res = new double[flowIds.length];
+        for (int i = 0; i < res.length; i++) {
+            int src = srcVms[i];
+            int dst = dstVms[i];
+            if (src < 0 || dst < 0) {
+                res[i] = -1.0;
+                continue;
+            }
+            try {
+                res[i] = nos.calculateLatency(src, dst, flowIds[i]);
+            } catch (RuntimeException e) {
+                res[i] = -1.0;
+            }
+        }
+        return toBytes(res);
+    }
+
+    /**
+     * Batched variant of getRequestedBandwidth. Flow ids are passed as little-endian
+     * int32 bytes; the result is little-endian float64 bytes.
+     */
+    public byte[] getRequestedBandwidths(byte[] flowIdBytes) {
+        int[] flowIds = toInts(flowIdBytes);
+        double[] res = new double[flowIds.length];
+        for (int i = 0; i < res.length; i++) {
+            res[i] = nos.getRequestedBandwidth(flowIds[i]);
+        }
+        return toBytes(res);
+    }
+
+    /**
+     * Everything the RL environment reads per state, packed into a single byte[] so
+     * Py4J transfers it in one round-trip. Little-endian layout:
+     * [time f8][running i4][nLinks i4][nFlows i4][utilEncoding i4]
+     * [link avg utilization * nLinks][flow avg latency f8 * nFlows][flow id i4 * nFlows]
+     * Links are ordered as getAllLinkIds(); latencies are aligned with the flow ids.
+     * The returned array is a persistent buffer overwritten by the next call, and
+     * Py4J serializes it after this method returns, so callers must not overlap
+     * calls: this assumes a single RL loop polling the bridge, which reads each
+     * reply before issuing the next request (CloudSimSDNEnv enforces this).
+     */
+    public byte[] getStateBytes(double windowSeconds) {
+        return getStateBytes(windowSeconds, false);
+    }
+
+    /**
+     * getStateBytes(), optionally with link utilizations quantized to 16 bits.
+     * With quantizeUtils the utilEncoding header field is 1 and each utilization
+     * is clamped to [0, 1] and sent as a u2 fixed-point value (u / 65535), padded
+     * to a multiple of 8 bytes; otherwise utilEncoding is 0 and they are f8.
+     * Latencies are unbounded, so they are always sent as f8.
+     */
+    public byte[] getStateBytes(double windowSeconds, boolean quantizeUtils) {
+        double[] utils = nos.getLinkAvgUtilizations(windowSeconds);
+        List<Integer> flowIds = nos.getFlowIds();
+        int nFlows = flowIds.size();
+        int utilBytes = quantizeUtils ? (2 * utils.length + 7) / 8 * 8 : 8 * utils.length;
+        int size = 24 + utilBytes + 12 * nFlows;
+        if (stateBuf.capacity() != size) {
+            stateBuf = ByteBuffer.allocate(size).order(ByteOrder.LITTLE_ENDIAN);
+        }
+        ByteBuffer buf = stateBuf;
+        buf.clear();
+        buf.putDouble(CloudSim.clock());
+        buf.putInt(CloudSim.running() ? 1 : 0);
+        buf.putInt(utils.length);
+        buf.putInt(nFlows);
+        buf.putInt(quantizeUtils ? 1 : 0);
+        if (quantizeUtils) {
+            for (double u : utils) {
+                double clamped = u > 0.0 ? Math.min(u, 1.0) : 0.0; // NaN -> 0
+                buf.putShort((short) Math.round(clamped * 65535.0));
+            }
+            buf.position(24 + utilBytes);
+        } else {
+            for (double u : utils) {
+                buf.putDouble(u);
+            }
+        }
+        for (Integer flowId : flowIds) {
+            buf.putDouble(nos.getFlowAvgLatency(flowId, windowSeconds));
+        }
+        for (Integer flowId : flowIds) {
+            buf.putInt(flowId);
+        }
+        return buf.array();
+    }
+
+    /**
+     * Simulation time, flow ids and link ids in one byte[] so a client can read
+     * them in a single round-trip. Little-endian layout:
+     * [time f8][nFlows i4][flow id i4 * nFlows][nLinks i4][labelBytes i4]
+     * [UTF-8 link ids joined by '\n', labelBytes long]
+     * Link ids are ordered as getAllLinkIds().
+     */
+    public byte[] getBridgeSnapshot() {
+        List<Integer> flowIds = nos.getFlowIds();
+        List<String> linkIds = nos.getAllLinkIds();
+        byte[] labels = String.join("\n", linkIds).getBytes(StandardCharsets.UTF_8);
+        ByteBuffer buf = ByteBuffer.allocate(20 + 4 * flowIds.size() + labels.length).order(ByteOrder.LITTLE_ENDIAN);
+        buf.putDouble(CloudSim.clock());
+        buf.putInt(flowIds.size());
+        for (Integer flowId : flowIds) {
+            buf.putInt(flowId);
+        }
+        buf.putInt(linkIds.size());
+        buf.putInt(labels.length);
+        buf.put(labels);
+        return buf.array();
+    }
+
     public double getTime() {
         return CloudSim.clock();
     }
 
+    // Py4J copies a byte[] in one transfer, whereas primitive arrays are
+    // returned as proxies whose elements are fetched one call at a time.
+    private static byte[] toBytes(double[] values) {
+        ByteBuffer buf = ByteBuffer.allocate(8 * values.length).order(ByteOrder.LITTLE_ENDIAN);
+        buf.asDoubleBuffer().put(values);
+        return buf.array();
+    }
+
+    private static byte[] toBytes(int[] values) {
+        ByteBuffer buf = ByteBuffer.allocate(4 * values.length).order(ByteOrder.LITTLE_ENDIAN);
+        buf.asIntBuffer().put(values);
+        return buf.array();
+    }
+
+    // Python bytes arrive as byte[] without needing auto_convert on the gateway,
+    // unlike lists, which are only converted to java.util.List when it is enabled
+    private static int[] toInts(byte[] bytes) {
+        int[] values = new int[bytes.length / 4];
+        ByteBuffer.wrap(bytes).order(ByteOrder.LITTLE_ENDIAN).asIntBuffer().get(values);
+        return values;
+    }
+
     /**
      * Return whether the CloudSim simulation engine is currently running.
      * Exposed to Python via Py4J.
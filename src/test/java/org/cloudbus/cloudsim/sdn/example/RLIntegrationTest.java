@@ -3,6 +3,8 @@ package org.cloudbus.cloudsim.sdn.example;
 import org.junit.Test;
 import static org.junit.Assert.*;
 
+import java.nio.ByteBuffer;
+import java.nio.ByteOrder;
 import java.util.List;
 import py4j.GatewayServer;
 import org.cloudbus.cloudsim.core.CloudSim;
@@ -58,6 +60,26 @@ public class RLIntegrationTest {
             assertTrue("Utilization should be between 0 and 1", util >= 0.0 && util <= 1.0);
         }
         
+        // Test the state snapshot wire format, full precision and quantized
+        for (boolean quantize : new boolean[] {false, true}) {
+            ByteBuffer buf = ByteBuffer.wrap(bridge.getStateBytes(1.0, quantize)).order(ByteOrder.LITTLE_ENDIAN);
+            double time = buf.getDouble(0);
+            int running = buf.getInt(8);
+            int nLinks = buf.getInt(12);
+            int nFlows = buf.getInt(16);
+            int utilEncoding = buf.getInt(20);
+            int utilBytes = quantize ? (2 * nLinks + 7) / 8 * 8 : 8 * nLinks;
+            assertTrue("Snapshot time should be non-negative", time >= 0.0);
+            assertTrue("Running flag should be 0 or 1", running == 0 || running == 1);
+            assertEquals("Snapshot link count", linkIds.size(), nLinks);
+            assertEquals("Util encoding flag", quantize ? 1 : 0, utilEncoding);
+            assertEquals("Snapshot length", 24 + utilBytes + 12 * nFlows, buf.capacity());
+            for (int i = 0; i < nFlows; i++) {
+                int flowId = buf.getInt(24 + utilBytes + 8 * nFlows + 4 * i);
+                assertTrue("Snapshot flow id should be known", bridge.getFlowIds().contains(flowId));
+            }
+        }
+
         // Let simulation run briefly
         Thread.sleep(1000);
         